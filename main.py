@@ -8,18 +8,26 @@ Usage:
     python main.py                          # Run with default settings (localhost:8000)
     python main.py --host 0.0.0.0 --port 8080  # Custom host and port
     python main.py --reload                 # Enable auto-reload for development
+    python main.py --workers 4              # Run 4 API workers sharing one set of MCP servers
 
 Environment Variables:
     API_HOST: Server host address (default: 0.0.0.0)
     API_PORT: Server port number (default: 8000)
+    API_WORKERS: Number of API worker processes (default: 1)
     RELOAD: Enable auto-reload mode (default: false)
     LOG_LEVEL: Logging level (default: info)
+    MCP_HOST_PORT: Port of the MCP host sidecar used with multiple workers (default: 8765)
+    MCP_HOST_URL: Use an already running MCP host instead of starting one
 """
 
 import argparse
+import json
 import logging
 import os
+import subprocess
 import sys
+import time
+import urllib.request
 from pathlib import Path
 
 # Add src directory to Python path to ensure imports work correctly
@@ -35,6 +43,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# How long to wait for the MCP host sidecar to start its MCP servers
+MCP_HOST_STARTUP_TIMEOUT = float(os.getenv("MCP_HOST_STARTUP_TIMEOUT", "120"))
+
 
 def parse_arguments():
     """Parse command-line arguments."""
@@ -65,6 +76,20 @@ def parse_arguments():
         help="Enable auto-reload mode for development"
     )
     
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.getenv("API_WORKERS", "1")),
+        help="Number of API worker processes; with more than one, MCP servers run once in a shared MCP host (default: 1)"
+    )
+    
+    parser.add_argument(
+        "--mcp-host-port",
+        type=int,
+        default=int(os.getenv("MCP_HOST_PORT", "8765")),
+        help="Port of the MCP host sidecar used with multiple workers (default: 8765)"
+    )
+    
     parser.add_argument(
         "--log-level",
         type=str,
@@ -89,8 +114,56 @@ def check_requirements():
         return False
 
 
+def start_mcp_host(port: int, log_level: str) -> subprocess.Popen:
+    """
+    Start the MCP host sidecar and wait until its MCP servers finish starting.
+    
+    The sidecar runs every local (stdio) MCP server once; API workers connect
+    to it over streamable HTTP instead of spawning their own copies.
+    """
+    logger.info(f"Starting MCP host on 127.0.0.1:{port}")
+    process = subprocess.Popen([
+        sys.executable,
+        str(Path(__file__).parent / "src" / "mcp_host.py"),
+        "--host", "127.0.0.1",
+        "--port", str(port),
+        "--log-level", log_level
+    ])
+    
+    health_url = f"http://127.0.0.1:{port}/health"
+    deadline = time.monotonic() + MCP_HOST_STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"MCP host exited with code {process.returncode}")
+        try:
+            with urllib.request.urlopen(health_url, timeout=2) as response:
+                servers = json.load(response)["servers"]
+            if servers and all(info["status"] != "starting" for info in servers.values()):
+                for name, info in servers.items():
+                    logger.info(f"MCP server {name}: {info['status']} ({info['seconds']}s)")
+                return process
+        except OSError:
+            pass
+        time.sleep(0.5)
+    
+    logger.warning("MCP host is still starting its servers, workers will connect as they become ready")
+    return process
+
+
+def stop_mcp_host(process: subprocess.Popen):
+    """Stop the MCP host sidecar (and with it the MCP servers)."""
+    if process.poll() is not None:
+        return
+    process.terminate()
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
 def main():
     """Main entry point for the API server."""
+    mcp_host = None
     try:
         # Parse command-line arguments
         args = parse_arguments()
@@ -103,6 +176,16 @@ def main():
         if not check_requirements():
             sys.exit(1)
         
+        if args.workers > 1 and args.reload:
+            logger.error("--reload cannot be combined with --workers")
+            sys.exit(1)
+        
+        # With multiple workers the MCP servers run once in a shared MCP host
+        if args.workers > 1 and not os.getenv("MCP_HOST_URL"):
+            mcp_host = start_mcp_host(args.mcp_host_port, args.log_level)
+            # Inherited by the worker processes (read by agent_core)
+            os.environ["MCP_HOST_URL"] = f"http://127.0.0.1:{args.mcp_host_port}"
+        
         # Import after adding to path
         from api import app
         import uvicorn
@@ -114,6 +197,9 @@ def main():
         logger.info(f"Host: {args.host}")
         logger.info(f"Port: {args.port}")
         logger.info(f"Reload: {args.reload}")
+        logger.info(f"Workers: {args.workers}")
+        if os.getenv("MCP_HOST_URL"):
+            logger.info(f"MCP Host: {os.getenv('MCP_HOST_URL')}")
         logger.info(f"Log Level: {args.log_level}")
         logger.info("=" * 60)
         logger.info(f"API Documentation: http://{args.host if args.host != '0.0.0.0' else 'localhost'}:{args.port}/docs")
@@ -135,6 +221,7 @@ def main():
             host=args.host,
             port=args.port,
             reload=args.reload,
+            workers=args.workers,
             log_level=args.log_level,
             access_log=True
         )
@@ -150,6 +237,10 @@ def main():
         logger.error(f"Failed to start server: {e}", exc_info=True)
         logger.error("=" * 60)
         sys.exit(1)
+    
+    finally:
+        if mcp_host is not None:
+            stop_mcp_host(mcp_host)
 
 
 if __name__ == "__main__":
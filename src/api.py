@@ -1,7 +1,10 @@
+from contextlib import asynccontextmanager
 from urllib.parse import urlencode
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Depends, HTTPException, status, Request
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Depends, HTTPException, Query, status, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
+from typing import Dict, Optional
+import asyncio
 import json
 import os
 import time
@@ -28,7 +31,15 @@ NOTION_CLIENT_ID = "YvWLaE2nKO861jM1"  # Veřejný Notion MCP client
 NOTION_CALLBACK_URL = "http://localhost:8080/callback"  # MCP má registrovaný jen localhost
 NOTION_TOKEN_PATH = str(Path(__file__).parent / "lib" / "tokens" / "notion_tokens.json")
 
-from agent_core import get_agent_service, run_agent_query
+# Maximální počet souběžně běžících dotazů na jednom WebSocket připojení
+WS_MAX_CONCURRENT_REQUESTS = int(os.getenv("WS_MAX_CONCURRENT_REQUESTS", "3"))
+
+# Jak často SSE stream kontroluje, zda je klient stále připojen (a posílá keepalive)
+SSE_DISCONNECT_CHECK_SECONDS = float(os.getenv("SSE_DISCONNECT_CHECK_SECONDS", "5"))
+
+from agent_core import get_agent_service, run_agent_query, sessions as fallback_sessions
+from session_concurrency import SessionBusyError
+from admission import AdmissionRejectedError
 from auth import (
     verify_api_key,
     is_auth_configured,
@@ -43,8 +54,22 @@ from auth import (
 # Import session manager
 sys.path.insert(0, str(Path(__file__).parent / "lib"))
 from session_manager import get_session_manager
+from token_refresher import TokenRefresher
+from token_store import write_tokens
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Připojit Redis pool při startu, aby první request nečekal na připojení
+    session_manager = get_session_manager()
+    await session_manager.connect()
+    # Obnova OAuth tokenů na pozadí - změněný Notion token se propíše do Notion MCP bez restartu ostatních serverů
+    token_refresher = TokenRefresher(on_notion_token_changed=get_agent_service().apply_notion_token)
+    token_refresher.start()
+    yield
+    await token_refresher.stop()
+    await session_manager.close()
 
-app = FastAPI(title="MCP Agent API")
+app = FastAPI(title="MCP Agent API", lifespan=lifespan)
 
 # CORS pro Next.js (běží defaultně na localhost:3000)
 app.add_middleware(
@@ -159,9 +184,7 @@ async def ticktick_callback(request: Request):
         tokens["client_id"] = TICKTICK_CLIENT_ID
         tokens["client_secret"] = TICKTICK_CLIENT_SECRET
         
-        Path(TICKTICK_TOKEN_PATH).parent.mkdir(parents=True, exist_ok=True)
-        with open(TICKTICK_TOKEN_PATH, "w", encoding="utf-8") as f:
-            json.dump(tokens, f, ensure_ascii=False, indent=2)
+        write_tokens(TICKTICK_TOKEN_PATH, tokens)
         
         print(f"💾 Tokens saved to {TICKTICK_TOKEN_PATH}")
         
@@ -211,9 +234,8 @@ async def upload_notion_tokens(
         "scope": ""
     }
     
-    Path(NOTION_TOKEN_PATH).parent.mkdir(parents=True, exist_ok=True)
-    with open(NOTION_TOKEN_PATH, "w", encoding="utf-8") as f:
-        json.dump(tokens, f, ensure_ascii=False, indent=2)
+    # Refresher na pozadí nový token načte a přepojí s ním Notion MCP
+    write_tokens(NOTION_TOKEN_PATH, tokens)
     
     return {"detail": "Notion tokeny úspěšně nahrány a uloženy."}
 
@@ -275,7 +297,12 @@ async def chat(request: ChatMessage, api_key: str = Depends(verify_api_key)):
     if session_id is None:
         session_id = f"sess_{uuid.uuid4().hex[:12]}"
     
-    result = await run_agent_query(request.message, session_id)
+    try:
+        result = await run_agent_query(request.message, session_id)
+    except SessionBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except AdmissionRejectedError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     return {"response": result, "session_id": session_id}
 
 # WebSocket endpoint (pro streaming) - CHRÁNĚNÝ
@@ -327,12 +354,69 @@ async def websocket_chat(websocket: WebSocket):
     # Session ID pro toto WebSocket připojení
     import uuid
     websocket_session_id = None
+    # Běžící dotazy tohoto připojení (request_id -> task) - přijímání zpráv na nich nečeká
+    tasks: Dict[str, asyncio.Task] = {}
+    # Odpovědi posílá více tasků najednou, zápis do socketu musí být serializovaný
+    send_lock = asyncio.Lock()
+    
+    async def send(payload: dict):
+        async with send_lock:
+            await websocket.send_json(payload)
+    
+    async def handle_message(request_id: str, user_message: str, session_id: str):
+        """Spustí agenta a průběžně přeposílá tokeny, volání nástrojů a výsledek označené request_id"""
+        try:
+            async for event in agent_service.stream_query(user_message, session_id):
+                event["session_id"] = session_id
+                event["request_id"] = request_id
+                await send(event)
+        except asyncio.CancelledError:
+            try:
+                await send({"type": "cancelled", "request_id": request_id, "session_id": session_id})
+            except Exception:
+                pass
+            raise
+        except Exception as e:
+            error = {
+                "type": "error",
+                "message": str(e),
+                "request_id": request_id,
+                "session_id": session_id
+            }
+            if isinstance(e, AdmissionRejectedError):
+                error["retry_after"] = e.retry_after
+            try:
+                await send(error)
+            except Exception:
+                pass
+        finally:
+            tasks.pop(request_id, None)
     
     try:
         while True:
             # Přijmout zprávu od klienta
             data = await websocket.receive_text()
-            message_data = json.loads(data)
+            try:
+                message_data = json.loads(data)
+            except json.JSONDecodeError:
+                await send({"type": "error", "message": "Neplatný JSON"})
+                continue
+            
+            frame_type = message_data.get("type", "message")
+            request_id = message_data.get("request_id")
+            
+            if frame_type == "ping":
+                await send({"type": "pong", "request_id": request_id})
+                continue
+            
+            if frame_type == "cancel":
+                task = tasks.get(request_id)
+                if task is None:
+                    await send({"type": "error", "message": "Dotaz s tímto request_id neběží", "request_id": request_id})
+                else:
+                    task.cancel()
+                continue
+            
             user_message = message_data.get("message", "")
             client_session_id = message_data.get("session_id")
             
@@ -343,40 +427,43 @@ async def websocket_chat(websocket: WebSocket):
             elif websocket_session_id is None:
                 websocket_session_id = f"sess_{uuid.uuid4().hex[:12]}"
             
+            if request_id is None:
+                request_id = f"req_{uuid.uuid4().hex[:8]}"
+            if request_id in tasks:
+                await send({"type": "error", "message": "Dotaz s tímto request_id už běží", "request_id": request_id})
+                continue
+            if len(tasks) >= WS_MAX_CONCURRENT_REQUESTS:
+                await send({
+                    "type": "error",
+                    "message": f"Příliš mnoho souběžných dotazů (max {WS_MAX_CONCURRENT_REQUESTS} na připojení)",
+                    "request_id": request_id,
+                    "session_id": websocket_session_id
+                })
+                continue
+            
             # Poslat potvrzení
-            await websocket.send_json({
+            await send({
                 "type": "status",
                 "message": "Processing...",
-                "session_id": websocket_session_id
+                "session_id": websocket_session_id,
+                "request_id": request_id
             })
             
-            # Spustit agenta
-            try:
-                result = await agent_service.run_query(user_message, websocket_session_id)
-                
-                # Poslat výsledek
-                await websocket.send_json({
-                    "type": "response",
-                    "message": result,
-                    "done": True,
-                    "session_id": websocket_session_id
-                })
-            except Exception as e:
-                await websocket.send_json({
-                    "type": "error",
-                    "message": str(e),
-                    "session_id": websocket_session_id
-                })
+            tasks[request_id] = asyncio.create_task(handle_message(request_id, user_message, websocket_session_id))
                 
     except WebSocketDisconnect:
         print("Client disconnected")
     except Exception as e:
         print(f"Error: {e}")
         await websocket.close()
+    finally:
+        # Klient je pryč - rozpracované dotazy nemá kdo číst, zrušit je
+        for task in list(tasks.values()):
+            task.cancel()
 
 # Server-Sent Events varianta (alternativa k WebSocket) - PROTECTED
 @app.get("/api/chat/stream")
-async def chat_stream(message: str, session_id: str = None, api_key: str = Depends(verify_api_key)):
+async def chat_stream(request: Request, message: str, session_id: str = None, api_key: str = Depends(verify_api_key)):
     from fastapi.responses import StreamingResponse
     import uuid
     
@@ -390,14 +477,40 @@ async def chat_stream(message: str, session_id: str = None, api_key: str = Depen
         # Odeslat status
         yield f"data: {json.dumps({'type': 'status', 'message': 'Processing...', 'session_id': session_id})}\n\n"
         
+        # Agent běží ve vlastním tasku, aby ho šlo zrušit, když se klient odpojí (i uprostřed volání nástroje)
+        queue: asyncio.Queue = asyncio.Queue()
+        
+        async def pump():
+            try:
+                # Spustit agenta a průběžně odesílat tokeny, volání nástrojů a výsledek
+                async for event in agent_service.stream_query(message, session_id):
+                    queue.put_nowait(event)
+            except AdmissionRejectedError as e:
+                queue.put_nowait({'type': 'error', 'message': str(e), 'retry_after': e.retry_after})
+            except Exception as e:
+                queue.put_nowait({'type': 'error', 'message': str(e)})
+            finally:
+                queue.put_nowait(None)
+        
+        task = asyncio.create_task(pump())
         try:
-            # Spustit agenta
-            result = await agent_service.run_query(message, session_id)
-            
-            # Odeslat výsledek
-            yield f"data: {json.dumps({'type': 'response', 'message': result, 'done': True, 'session_id': session_id})}\n\n"
-        except Exception as e:
-            yield f"data: {json.dumps({'type': 'error', 'message': str(e), 'session_id': session_id})}\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=SSE_DISCONNECT_CHECK_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        print(f"Client disconnected, cancelling run for session {session_id}")
+                        return
+                    # SSE komentář - udrží spojení a odhalí odpojeného klienta i za proxy
+                    yield ": keepalive\n\n"
+                    continue
+                if event is None:
+                    return
+                event["session_id"] = session_id
+                yield f"data: {json.dumps(event, default=str)}\n\n"
+        finally:
+            if not task.done():
+                task.cancel()
     
     return StreamingResponse(
         event_generator(),
@@ -424,10 +537,41 @@ async def health():
     session_manager = get_session_manager()
     redis_status = "connected" if session_manager._connected else "disconnected"
     
+    agent_service = get_agent_service()
+    
     return {
         "status": "healthy",
         "authentication": auth_status,
-        "redis": redis_status
+        "redis": redis_status,
+        "session_cache": session_manager.cache_stats(),
+        "session_fallback": fallback_sessions.stats(),
+        "agent_pool": agent_service.agent_pool.stats(),
+        "tool_catalog": agent_service.tool_catalog.stats(),
+        "session_locks": agent_service.session_locks.stats(),
+        "request_coalescing": agent_service.coalescer.stats(),
+        "agent_runs": agent_service.run_stats,
+        "admission": agent_service.admission.stats(),
+        "mcp_servers": agent_service.server_startup,
+        "mcp_health": agent_service.supervisor.stats()
+    }
+
+@app.get("/api/debug/tokens")
+async def debug_tokens(
+    session_id: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    api_key: str = Depends(verify_api_key)
+):
+    """Rozpad tokenů posledních dotazů (systémový prompt, nástroje, shrnutí, historie, dotaz)"""
+    agent_service = get_agent_service()
+    usage = [
+        entry for entry in agent_service.token_usage
+        if session_id is None or entry["session_id"] == session_id
+    ]
+    
+    # Nejnovější dotazy první
+    return {
+        "requests": usage[-limit:][::-1],
+        "count": len(usage)
     }
 
 # === SESSION MANAGEMENT ENDPOINTY ===
@@ -450,26 +594,44 @@ async def create_new_session(api_key: str = Depends(verify_api_key)):
 async def delete_session(session_id: str, api_key: str = Depends(verify_api_key)):
     """Smaže session (pro "New Chat" funkci)"""
     agent_service = get_agent_service()
-    agent_service.clear_session(session_id)
+    await agent_service.clear_session(session_id)
     
     return {"message": f"Session {session_id} byla smazána"}
 
 @app.get("/api/sessions")
-async def list_sessions(api_key: str = Depends(verify_api_key)):
-    """Vrátí seznam všech aktivních sessions"""
+async def list_sessions(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    details: bool = False,
+    api_key: str = Depends(verify_api_key)
+):
+    """
+    Vrátí stránku aktivních sessions (nejnověji aktivní první)
+    Další stránku získáš předáním next_cursor jako ?cursor=
+    S ?details=true vrátí i metadata každé session (načtená jedním round-tripem)
+    """
     session_manager = get_session_manager()
-    session_ids = session_manager.list_sessions()
+    try:
+        page = await session_manager.list_sessions(limit=limit, cursor=cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Neplatný cursor")
     
-    return {
-        "sessions": session_ids,
-        "count": len(session_ids)
+    response = {
+        "sessions": page["sessions"],
+        "count": len(page["sessions"]),
+        "total": page["total"],
+        "next_cursor": page["next_cursor"]
     }
+    if details:
+        response["details"] = await session_manager.get_sessions_info(page["sessions"])
+    
+    return response
 
 @app.get("/api/sessions/{session_id}", response_model=SessionInfo)
 async def get_session_info(session_id: str, api_key: str = Depends(verify_api_key)):
     """Získá informace o konkrétní session"""
     session_manager = get_session_manager()
-    info = session_manager.get_session_info(session_id)
+    info = await session_manager.get_session_info(session_id)
     
     if info is None:
         raise HTTPException(status_code=404, detail="Session not found")
@@ -480,7 +642,7 @@ async def get_session_info(session_id: str, api_key: str = Depends(verify_api_ke
 async def get_session_history(session_id: str, api_key: str = Depends(verify_api_key)):
     """Vrátí celou historii konverzace"""
     agent_service = get_agent_service()
-    history = agent_service.get_session_history(session_id)
+    history = await agent_service.get_session_history(session_id)
     
     return {
         "session_id": session_id,
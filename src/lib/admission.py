@@ -0,0 +1,115 @@
+"""
+Admission Control pro JARVIS
+Omezuje počet souběžně běžících agentů, další dotazy čekají v omezené frontě
+"""
+
+import asyncio
+import logging
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejectedError(RuntimeError):
+    """Služba je přetížená - fronta je plná nebo se na volné místo nedočkalo včas"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Limit souběžných běhů agenta s omezenou čekací frontou"""
+
+    def __init__(self, max_concurrent: int = 8, max_queue: int = 32, queue_timeout: float = 30):
+        """
+        Inicializace limiteru
+
+        Args:
+            max_concurrent: Kolik běhů agenta může běžet současně
+            max_queue: Kolik dotazů smí čekat ve frontě, další se odmítnou
+            queue_timeout: Jak dlouho nejvýše čekat ve frontě (sekundy)
+        """
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self.running = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        # Klouzavý průměr délky běhu - pro odhad Retry-After
+        self.avg_run_seconds = 10.0
+
+    def queue_position(self) -> int:
+        """Pozice, na kterou by se nový dotaz zařadil (0 = poběží hned)"""
+        if not self._semaphore.locked() and self.queued == 0:
+            return 0
+        return self.queued + 1
+
+    def retry_after(self) -> int:
+        """Odhad, za kolik sekund se uvolní místo"""
+        return max(1, math.ceil(self.avg_run_seconds * (self.queued + 1) / self.max_concurrent))
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """
+        Zabere místo pro jeden běh agenta (případně počká ve frontě)
+
+        Raises:
+            AdmissionRejectedError: Fronta je plná nebo vypršel queue_timeout
+        """
+        if self.queue_position() > self.max_queue:
+            self.rejected += 1
+            raise AdmissionRejectedError("Služba je přetížená, zkuste to prosím později", self.retry_after())
+
+        enqueued_at = time.monotonic()
+        if self._semaphore.locked() or self.queued:
+            self.queued += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.timed_out += 1
+                raise AdmissionRejectedError("Vypršel čas čekání ve frontě, zkuste to prosím později", self.retry_after())
+            finally:
+                self.queued -= 1
+        else:
+            # Volné místo - semafor se získá hned, dotaz se do fronty nepočítá
+            await self._semaphore.acquire()
+
+        waited = time.monotonic() - enqueued_at
+        self.admitted += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        if waited > 1:
+            logger.info(f"🚦 Dotaz čekal ve frontě {waited:.1f}s")
+
+        self.running += 1
+        started_at = time.monotonic()
+        try:
+            yield
+        finally:
+            self.running -= 1
+            self._semaphore.release()
+            self.avg_run_seconds = 0.8 * self.avg_run_seconds + 0.2 * (time.monotonic() - started_at)
+
+    def stats(self) -> Dict[str, Any]:
+        """Vrátí metriky pro /health"""
+        return {
+            "running": self.running,
+            "max_concurrent": self.max_concurrent,
+            "queued": self.queued,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "avg_wait_seconds": round(self.total_wait / self.admitted, 3) if self.admitted else None,
+            "max_wait_seconds": round(self.max_wait, 3),
+            "avg_run_seconds": round(self.avg_run_seconds, 1)
+        }
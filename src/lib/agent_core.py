@@ -1,21 +1,35 @@
 import asyncio
+import httpx
 import logging
-from langchain.schema import HumanMessage, AIMessage
+import time
+from collections import deque
 from langchain_openai import ChatOpenAI
 from mcp_use import MCPAgent, MCPClient
+from mcp.types import ServerNotification, ToolListChangedNotification
 import dotenv
 import os
 import sys
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, AsyncIterator, Callable, Iterator, Optional
 from session_manager import get_session_manager
+from session_cache import SessionCache
+from history_window import HistoryWindow
+from token_accounting import count_tokens, message_tokens, trim_to_budget
+from session_concurrency import RequestCoalescer, SessionLocks
+from admission import AdmissionController, AdmissionRejectedError
+from agent_pool import AgentPool
+from tool_catalog import ToolCatalog
+from mcp_config import NOTION_SERVER, SELF_REFRESHING_SERVERS, build_mcp_config, notion_server_config
+from mcp_supervisor import ServerSupervisor
 
 logger = logging.getLogger(__name__)
 
 # Přidej src adresář do path (pro import notion_client)
 sys.path.insert(0, str(Path(__file__).parent.parent))
 sys.path.insert(0, str(Path(__file__).parent.parent / "notion-mcp"))
+sys.path.insert(0, str(Path(__file__).parent.parent / "ticktick-mcp"))
 from notion_client import get_notion_access_token
+from ticktick_client import AUTH_FAILED_ERROR
 
 dotenv.load_dotenv()
 
@@ -24,6 +38,45 @@ LINKUP_API_KEY = os.getenv("LINKUP_API_KEY")
 N8N_API_URL = os.getenv("N8N_API_URL")
 N8N_API_KEY = os.getenv("N8N_API_KEY")
 
+# Konfigurace poolu agentů - velikost omezuje počet agentů celkem (zapůjčených i nečinných),
+# výchozí hodnota odpovídá počtu souběžných běhů z admission control, aby žádný přijatý dotaz nečekal na agenta
+AGENT_POOL_SIZE = int(os.getenv("AGENT_POOL_SIZE", os.getenv("AGENT_MAX_CONCURRENT_RUNS", "8")))
+AGENT_POOL_IDLE_SECONDS = int(os.getenv("AGENT_POOL_IDLE_SECONDS", "900"))
+AGENT_MAX_STEPS = 30
+
+# MCP host (režim s více workery) - lokální MCP servery běží jednou v hostu, workery se k nim připojují přes HTTP
+MCP_HOST_URL = os.getenv("MCP_HOST_URL")
+
+# Start MCP serverů - timeout jednoho serveru a jak dlouho čekat, než služba začne odpovídat
+MCP_SERVER_STARTUP_TIMEOUT = float(os.getenv("MCP_SERVER_STARTUP_TIMEOUT", "60"))
+MCP_STARTUP_READY_TIMEOUT = float(os.getenv("MCP_STARTUP_READY_TIMEOUT", "15"))
+
+# Okno historie - kolik posledních tahů jde do agenta doslova (0 = celá historie)
+# a o kolik tahů musí okno přetéct, než se starší tahy složí do shrnutí
+HISTORY_WINDOW_TURNS = int(os.getenv("HISTORY_WINDOW_TURNS", "10"))
+HISTORY_SUMMARY_BATCH_TURNS = int(os.getenv("HISTORY_SUMMARY_BATCH_TURNS", "5"))
+
+# Tokenový rozpočet vstupu jednoho dotazu (systémový prompt + nástroje + shrnutí + historie + dotaz)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "32000"))
+# Souběžné dotazy na stejnou session - jak dlouho čekat na zámek, po jaké době zámek v Redis vyprší
+# a zda stejné souběžné dotazy (dvojklik, reconnect) sdílí jeden běh agenta - vypnuto, dokud se nezapne:
+# dotaz se slučuje podle textu zprávy, takže záměrně zopakovaná zpráva by dostala odpověď prvního běhu
+SESSION_LOCK_WAIT = float(os.getenv("SESSION_LOCK_WAIT", "120"))
+SESSION_LOCK_TTL = float(os.getenv("SESSION_LOCK_TTL", "600"))
+SESSION_COALESCE_REQUESTS = os.getenv("SESSION_COALESCE_REQUESTS", "false").lower() == "true"
+
+# Admission control - kolik běhů agenta současně, kolik dotazů smí čekat ve frontě a jak dlouho
+AGENT_MAX_CONCURRENT_RUNS = int(os.getenv("AGENT_MAX_CONCURRENT_RUNS", "8"))
+AGENT_MAX_QUEUE = int(os.getenv("AGENT_MAX_QUEUE", "32"))
+AGENT_QUEUE_TIMEOUT = float(os.getenv("AGENT_QUEUE_TIMEOUT", "30"))
+
+# Kolik posledních rozpadů tokenů držet pro debug endpoint
+TOKEN_USAGE_HISTORY = 100
+
+# Limity paměťového fallbacku sessions (když Redis není dostupný)
+SESSION_FALLBACK_MAX_ENTRIES = int(os.getenv("SESSION_FALLBACK_MAX_ENTRIES", "1000"))
+SESSION_FALLBACK_MAX_BYTES = int(os.getenv("SESSION_FALLBACK_MAX_BYTES", str(50 * 1024 * 1024)))
+
 if not OPENROUTER_API_KEY:
     logger.error("❌ OPENROUTER_API_KEY není nastaven v .env souboru")
     raise ValueError("OPENROUTER_API_KEY není nastaven v .env souboru")
@@ -37,12 +90,30 @@ if not N8N_API_KEY:
     logger.error("❌ N8N_API_KEY není nastaven v .env souboru")
     raise ValueError("N8N_API_KEY není nastaven v .env souboru")
 
-# Globální sessions pro ukládání historie konverzací (fallback když Redis není dostupný)
-sessions: Dict[str, Dict[str, Any]] = {}
-
 # Session manager (Redis)
 session_manager = get_session_manager()
 
+# Sessions v paměti - fallback když Redis není dostupný (omezená LRU cache se stejným TTL jako Redis)
+sessions = SessionCache(
+    max_entries=SESSION_FALLBACK_MAX_ENTRIES,
+    max_bytes=SESSION_FALLBACK_MAX_BYTES,
+    ttl_seconds=session_manager.ttl_seconds
+)
+
+async def flush_fallback_sessions():
+    """Po obnovení spojení zapíše do Redis zprávy, které se během výpadku uložily jen do paměti"""
+    written = 0
+    for session_id, pending in sessions.pending_items():
+        if not await session_manager.append_messages(session_id, pending):
+            logger.warning(f"⚠️  Session {session_id} se nepodařilo zapsat zpět do Redis")
+            break
+        sessions.mark_written(session_id, len(pending))
+        written += 1
+    if written:
+        logger.info(f"💾 Zapsáno zpět do Redis {written} sessions z paměťového fallbacku")
+
+session_manager.add_reconnect_listener(flush_fallback_sessions)
+
 # Systémový prompt pro agenta
 system_prompt = """
     Jsi inteligentní asistent s názvem JARVIS. Pomáháš uživateli s různými úkoly pomocí nástrojů, které máš k dispozici.
@@ -76,17 +147,89 @@ system_prompt = """
     Totéž platí pro connections, settings a všechny ostatní složité struktury.
     """
 
+def _exception_chain(error: BaseException) -> Iterator[BaseException]:
+    """Projde výjimku, její příčiny (__cause__, __context__) a výjimky ve skupinách (TaskGroup)"""
+    seen = set()
+    pending = [error]
+    while pending:
+        current = pending.pop()
+        if current is None or id(current) in seen:
+            continue
+        seen.add(id(current))
+        yield current
+        pending.extend([current.__cause__, current.__context__])
+        if isinstance(current, BaseExceptionGroup):
+            pending.extend(current.exceptions)
+
+
+class AuthErrorWatch(httpx.Auth):
+    """
+    Auth HTTP MCP serveru, která hlavičky nemění (token je v "headers"), jen sleduje odpovědi serveru
+    401/403 na streamable HTTP spadne v task group transportu - k agentovi se dostane jen
+    "Connection closed" jako výsledek nástroje, proto se auth chyba zachytí přímo tady
+    """
+
+    def __init__(self, on_auth_error: Callable[[int], None]):
+        self.on_auth_error = on_auth_error
+
+    def auth_flow(self, request: httpx.Request):
+        response = yield request
+        if response.status_code in (401, 403):
+            self.on_auth_error(response.status_code)
+
+
 class AgentService:
     """Service pro správu MCP agenta a konverzací"""
     def __init__(self):
         self.llm = None
         self.client = None
         self._initialized = False
+        self._init_lock = asyncio.Lock()
+        self._startup_tasks: Dict[str, asyncio.Task] = {}
+        # Časy a stav startu jednotlivých MCP serverů (exportováno na /health)
+        self.server_startup: Dict[str, Dict[str, Any]] = {}
+        self.tool_catalog = ToolCatalog()
+        # Health check MCP serverů - při výpadku se restartuje jen daný server
+        self.supervisor = ServerSupervisor(
+            get_client=lambda: self.client if self._initialized else None,
+            restart_server=self.restart_server,
+            is_starting=lambda server_name: self.server_startup.get(server_name, {}).get("status") == "starting"
+        )
+        self.agent_pool = AgentPool(
+            self._create_agent,
+            max_size=AGENT_POOL_SIZE,
+            idle_seconds=AGENT_POOL_IDLE_SECONDS
+        )
+        self.history_window = HistoryWindow(
+            window_turns=HISTORY_WINDOW_TURNS,
+            batch_turns=HISTORY_SUMMARY_BATCH_TURNS
+        )
+        # Běžící skládání shrnutí (session_id -> task), nejvýše jedno na session
+        self._summary_tasks: Dict[str, asyncio.Task] = {}
+        # Běžící znovupřipojení serverů po auth chybě (server_name -> task)
+        self._reconnect_tasks: Dict[str, asyncio.Task] = {}
+        self.session_locks = SessionLocks(session_manager, lock_ttl=SESSION_LOCK_TTL, wait_timeout=SESSION_LOCK_WAIT)
+        self.coalescer = RequestCoalescer()
+        self.admission = AdmissionController(
+            max_concurrent=AGENT_MAX_CONCURRENT_RUNS,
+            max_queue=AGENT_MAX_QUEUE,
+            queue_timeout=AGENT_QUEUE_TIMEOUT
+        )
+        # Výsledky běhů agenta (zrušené = klient se odpojil nebo dotaz zrušil)
+        self.run_stats = {"completed": 0, "failed": 0, "cancelled": 0}
+        # Rozpad tokenů posledních dotazů (pro /api/debug/tokens)
+        self.token_usage = deque(maxlen=TOKEN_USAGE_HISTORY)
 
     async def initialize(self):
-        """Inicializace LLM a MCP klienta"""
+        """Inicializace LLM a MCP klienta (souběžná volání počkají na jedinou inicializaci)"""
         if self._initialized:
             return
+        async with self._init_lock:
+            if not self._initialized:
+                await self._initialize()
+
+    async def _initialize(self):
+        """Vlastní inicializace - volat pouze přes initialize()"""
         self.llm = ChatOpenAI(
             model="anthropic/claude-haiku-4.5",
             openai_api_base="https://openrouter.ai/api/v1",
@@ -94,86 +237,26 @@ class AgentService:
             temperature=0.2,
         )
         # Získat Notion access token
-        notion_token = get_notion_access_token()
+        notion_token = await asyncio.to_thread(get_notion_access_token)
         
         logger.info("🚀 Začínám inicializaci MCP serverů...")
         logger.info(f"📍 N8N_API_URL: {N8N_API_URL}")
         logger.info(f"📍 N8N_API_KEY: {'*' * len(N8N_API_KEY) if N8N_API_KEY else 'None'}")
         
-        # Zjisti, jestli jsou jednotlivé MCP servery povolené
-        enable_whatsapp = os.getenv("ENABLE_WHATSAPP", "false").lower() == "true"
-        enable_n8n = os.getenv("ENABLE_N8N", "true").lower() == "true"
-        
-        config = {
-            "mcpServers": {
-                "TickTick": {
-                    "command": "python",
-                    "args": ["src/ticktick-mcp/server.py", "run"]
-                },
-                "linkup": {
-                    "command": "npx",
-                    "args": ["-y", "linkup-mcp-server", "apiKey=" + LINKUP_API_KEY]
-                },
-                "fetch": {
-                    "command": "npx",
-                    "args": [
-                        "mcp-fetch-server"
-                    ], 
-                    "env": {
-                        "max_length": "50000"
-                    }
-                }
-            }
-        }
-        
-        # Přidat WhatsApp pouze pokud je povolen
-        if enable_whatsapp:
-            logger.info("✅ Přidávám WhatsApp MCP server")
-            config["mcpServers"]["WhatsApp"] = {
-                "command": "uv",
-                "args": [
-                    "--directory",
-                    "/app/whatsapp-mcp/whatsapp-mcp-server",
-                    "run",
-                    "main.py"
-                ]
-            }
-        else:
-            logger.info("⏭️  WhatsApp MCP server je zakázán (ENABLE_WHATSAPP=false)")
-        
-        # Přidat N8N pouze pokud je povolen
-        if enable_n8n:
-            logger.info("✅ Přidávám N8N MCP server")
-            config["mcpServers"]["n8n"] = {
-                "command": "n8n-mcp",
-                "args": [],
-                "env": {
-                    "MCP_MODE": "stdio",
-                    "LOG_LEVEL": "error",
-                    "DISABLE_CONSOLE_OUTPUT": "true",
-                    "N8N_API_URL": f"{N8N_API_URL}",
-                    "N8N_API_KEY": f"{N8N_API_KEY}"
-                }
-            }
-        else:
-            logger.info("⏭️  N8N MCP server je zakázán (ENABLE_N8N=false)")
-        
-        # Přidat Notion pouze pokud máme validní token
-        # Používáme headers místo auth, abychom se vyhnuli automatickému OAuth flow
-        if notion_token:
-            config["mcpServers"]["Notion"] = {
-                "url": "https://mcp.notion.com/mcp",
-                "headers": {
-                    "Authorization": f"Bearer {notion_token}"
-                }
-            }
-        else:
-            logger.warning("⚠️  Notion není nakonfigurován - chybí access token")
+        config = build_mcp_config(
+            LINKUP_API_KEY,
+            N8N_API_URL,
+            N8N_API_KEY,
+            notion_token=notion_token,
+            host_url=MCP_HOST_URL
+        )
+        for server_name, server_config in config["mcpServers"].items():
+            self._watch_auth_errors(server_name, server_config)
         
         logger.info(f"🔧 Inicializuji MCP klienta s těmito servery: {list(config['mcpServers'].keys())}")
         
         try:
-            self.client = MCPClient.from_dict(config)
+            self.client = MCPClient.from_dict(config, message_handler=self._on_server_message)
         except Exception as e:
             logger.error(f"❌ Chyba při vytváření MCP klienta: {e}")
             import traceback
@@ -182,66 +265,292 @@ class AgentService:
         
         logger.info("✅ MCP klient úspěšně vytvořen")
         
-        # Počkat na inicializaci sessions (dělá se asynchronně při prvním použití agenta)
-        logger.info("⏳ Čekám na vytvoření MCP sessions...")
-        await asyncio.sleep(1)
+        # Spustit všechny servery paralelně, každý s vlastním timeoutem a readiness probe
+        # Start tak trvá max(server) místo sum(server)
+        self.server_startup = {}
+        self._startup_tasks = {
+            server_name: asyncio.create_task(self._start_server(server_name))
+            for server_name in self.client.get_server_names()
+        }
+        
+        logger.info(f"⏳ Čekám na start MCP serverů (nejvýše {MCP_STARTUP_READY_TIMEOUT:.0f}s)...")
+        _, pending = await asyncio.wait(self._startup_tasks.values(), timeout=MCP_STARTUP_READY_TIMEOUT)
         
-        # Zkusit získat informace o aktivních sessions a nástrojích
+        ready = [name for name, info in self.server_startup.items() if info["status"] == "ready"]
+        logger.info(f"📡 Připravené servery: {ready}")
+        if pending:
+            # Opozdilci dobíhají na pozadí, služba mezitím odpovídá s připravenými servery
+            stragglers = [name for name, task in self._startup_tasks.items() if task in pending]
+            logger.warning(f"⏳ Servery {stragglers} se ještě spouští, budou přidány po dokončení")
+        
+        self._initialized = True
+        self.supervisor.start()
+
+    async def _start_server(self, server_name: str):
+        """
+        Spustí jeden MCP server a ověří jeho připravenost
+        Readiness probe = list_tools(), který zároveň naplní katalog nástrojů
+        """
+        started = time.monotonic()
+        self.server_startup[server_name] = {"status": "starting", "seconds": None}
         try:
-            active_sessions = self.client.get_all_active_sessions()
-            logger.info(f"📡 Aktivní sessions: {list(active_sessions.keys())}")
-            
-            # Pro každou session vypsat dostupné nástroje
-            for server_name, session in active_sessions.items():
-                try:
-                    if session.is_connected():
-                        tools = await session.list_tools()
-                        tool_names = [tool.name for tool in tools]
-                        logger.info(f"🔧 Server '{server_name}': {len(tools)} nástrojů - {tool_names}")
-                    else:
-                        logger.warning(f"⚠️  Server '{server_name}': není připojen")
-                except Exception as e:
-                    logger.warning(f"⚠️  Server '{server_name}': chyba při získávání nástrojů - {e}")
+            session = await asyncio.wait_for(
+                self.client.create_session(server_name),
+                timeout=MCP_SERVER_STARTUP_TIMEOUT
+            )
+            await asyncio.wait_for(
+                self.tool_catalog.refresh_server(server_name, session),
+                timeout=MCP_SERVER_STARTUP_TIMEOUT
+            )
+            status = "ready"
+        except asyncio.TimeoutError:
+            status = "timeout"
         except Exception as e:
-            logger.warning(f"⚠️  Nelze získat informace o sessions: {e}")
+            logger.error(f"❌ Server '{server_name}' se nepodařilo spustit: {e}")
+            status = "failed"
         
-        self._initialized = True
-    
+        elapsed = round(time.monotonic() - started, 3)
+        self.server_startup[server_name] = {"status": status, "seconds": elapsed}
+        if status == "ready":
+            logger.info(f"✅ Server '{server_name}' připraven za {elapsed}s")
+            # Server mohl doběhnout až po otevření služby - agenti v poolu ho ještě nemají
+            self.agent_pool.clear()
+        else:
+            logger.warning(f"⚠️  Server '{server_name}' není připraven ({status}) po {elapsed}s")
+
+    async def restart_server(self, server_name: str):
+        """
+        Restartuje jeden MCP server - ostatní servery i klient běží dál
+        Při neúspěchu vyhodí výjimku (supervisor zkusí restart znovu po backoffu)
+        """
+        client = self.client
+        if client is None:
+            raise RuntimeError("MCP klient není inicializován")
+        if server_name == NOTION_SERVER:
+            # Notion se připojuje s access tokenem - při každém restartu se použije aktuální (obnovený)
+            notion_token = await asyncio.to_thread(get_notion_access_token)
+            if not notion_token:
+                raise RuntimeError("Notion nemá platný access token")
+            client.config["mcpServers"][NOTION_SERVER] = self._watch_auth_errors(
+                NOTION_SERVER, notion_server_config(notion_token)
+            )
+        if server_name in client.sessions:
+            await client.close_session(server_name)
+        # Nástroje serveru jsou navázané na zavřenou session - agenti v poolu je nesmí dál používat
+        if self.tool_catalog.remove_server(server_name):
+            self.agent_pool.clear()
+        
+        session = await asyncio.wait_for(
+            client.create_session(server_name),
+            timeout=MCP_SERVER_STARTUP_TIMEOUT
+        )
+        await asyncio.wait_for(
+            self.tool_catalog.refresh_server(server_name, session),
+            timeout=MCP_SERVER_STARTUP_TIMEOUT
+        )
+        self.agent_pool.clear()
+
+    async def reconnect_server(self, server_name: str) -> bool:
+        """
+        Znovu připojí jeden MCP server (např. Notion po obnovení tokenu) - ostatní servery běží dál
+
+        Returns:
+            True pokud se server podařilo připojit
+        """
+        await self.initialize()
+        if server_name not in self.client.get_server_names():
+            if server_name != NOTION_SERVER:
+                raise ValueError(f"Neznámý MCP server '{server_name}'")
+            # Notion nebyl při startu nakonfigurován (chyběl token) - přidá se, jakmile token existuje
+            notion_token = await asyncio.to_thread(get_notion_access_token)
+            if not notion_token:
+                logger.warning("⚠️  Notion nelze připojit - chybí access token")
+                return False
+            self.client.add_server(NOTION_SERVER, self._watch_auth_errors(NOTION_SERVER, notion_server_config(notion_token)))
+        logger.info(f"🔌 Znovu připojuji MCP server '{server_name}'")
+        return await self.supervisor.restart(server_name, force=True)
+
+    async def apply_notion_token(self):
+        """
+        Přepojí Notion MCP s novým access tokenem (hlavička Authorization se nastavuje při připojení)
+        Ostatní servery ani rozběhnuté dotazy na jiných serverech to neovlivní
+        """
+        if not self._initialized:
+            # Klient ještě nevznikl - při inicializaci se použije aktuální token
+            return
+        await self.reconnect_server(NOTION_SERVER)
+
+    def _schedule_reconnect(self, server_name: str):
+        """Znovu připojí server na pozadí (nejvýše jedno připojení na server současně)"""
+        task = self._reconnect_tasks.get(server_name)
+        if task is not None and not task.done():
+            return
+        task = asyncio.create_task(self.reconnect_server(server_name))
+        self._reconnect_tasks[server_name] = task
+        task.add_done_callback(lambda _: self._reconnect_tasks.pop(server_name, None))
+
+    def _server_for_url(self, url: str) -> Optional[str]:
+        """Najde MCP server podle URL požadavku (HTTP servery - Notion, servery v MCP hostu)"""
+        if self.client is None:
+            return None
+        for server_name, server_config in self.client.config.get("mcpServers", {}).items():
+            server_url = server_config.get("url")
+            if server_url and url.startswith(server_url.rstrip("/")):
+                return server_name
+        return None
+
+    def _auth_error_server(self, error: BaseException) -> Optional[str]:
+        """
+        Určí MCP server, jehož odpověď auth chybu způsobila (401/403 z HTTP požadavku na server)
+        None pro chyby, které z MCP serveru nepochází (např. neplatný klíč LLM) - reconnect by nepomohl
+        """
+        for cause in _exception_chain(error):
+            if isinstance(cause, httpx.HTTPStatusError) and cause.response.status_code in (401, 403):
+                server_name = self._server_for_url(str(cause.request.url))
+                return None if server_name in SELF_REFRESHING_SERVERS else server_name
+        return None
+
+    def _watch_auth_errors(self, server_name: str, server_config: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        HTTP serveru (Notion, servery v MCP hostu) přidá AuthErrorWatch - při 401/403 se server znovu připojí
+        Servery s vlastní obnovou tokenu (TickTick) se nesledují, jejich restart by nepomohl
+        """
+        if "url" in server_config and server_name not in SELF_REFRESHING_SERVERS:
+            server_config["auth"] = AuthErrorWatch(lambda status: self._on_http_auth_error(server_name, status))
+        return server_config
+
+    def _on_http_auth_error(self, server_name: str, status: int):
+        """HTTP MCP server odmítl požadavek (typicky vypršelý token) - připojí ho znovu s aktuálním tokenem"""
+        if self.server_startup.get(server_name, {}).get("status") == "starting":
+            # Start serveru selže sám a další pokusy řídí supervisor
+            return
+        logger.warning(f"⚠️  MCP server '{server_name}' vrátil HTTP {status}, znovu připojuji")
+        self._schedule_reconnect(server_name)
+
+    @staticmethod
+    def _tool_reauth_required(output: Any) -> bool:
+        """Nástroj vrátil AUTH_FAILED_ERROR - server token obnovit nedokázal, pomůže jen nové přihlášení"""
+        text = output.get("details") if isinstance(output, dict) else output
+        return isinstance(text, str) and AUTH_FAILED_ERROR["error"] in text
+
+    def _check_tool_auth_error(self, tool_name: str, output: Any):
+        """
+        Nástroj serveru s vlastní obnovou tokenu (TickTick) hlásí, že obnova selhala - restart nepomůže, jen nové přihlášení
+        401/403 HTTP serverů zachytí AuthErrorWatch už v transportu
+        """
+        # Výstup nástroje přichází jako ToolMessage s textovým obsahem
+        output = getattr(output, "content", output)
+        if self._tool_reauth_required(output):
+            logger.warning(f"⚠️  Nástroj '{tool_name}' nemá platný token a obnova selhala - je potřeba se znovu přihlásit")
+
+    async def _on_server_message(self, message):
+        """Handler zpráv od MCP serverů - při změně nástrojů označí katalog k obnovení"""
+        if isinstance(message, ServerNotification) and isinstance(message.root, ToolListChangedNotification):
+            logger.info("🔄 MCP server oznámil změnu nástrojů, katalog bude obnoven")
+            self.tool_catalog.mark_stale()
+
+    async def _refresh_tool_catalog(self):
+        """Obnoví katalog nástrojů; pokud se změnil, agenti v poolu se zahodí"""
+        if await self.tool_catalog.refresh(self.client):
+            self.agent_pool.clear()
+
+    async def _create_agent(self) -> MCPAgent:
+        """
+        Vytvoří a inicializuje nového agenta pro pool
+        Agent nemá vlastní paměť - historie session se mu předává při každém běhu
+        """
+        logger.info("🤖 Vytvářím nového MCPAgenta do poolu")
+        if self.tool_catalog.is_stale:
+            await self._refresh_tool_catalog()
+        
+        agent = MCPAgent(
+            llm=self.llm,
+            client=self.client,
+            max_steps=AGENT_MAX_STEPS,
+            # Agent prompt je ChatPromptTemplate - složené závorky v promptu (JSON příklady) je nutné escapovat
+            system_prompt=system_prompt.replace("{", "{{").replace("}", "}}"),
+            memory_enabled=False
+        )
+        # Nástroje se berou z katalogu - žádné list_tools() volání na serverech
+        await self.tool_catalog.attach_to_agent(agent)
+
+        tool_names = [tool.name for tool in agent._tools]
+        logger.info(f"🔧 Agent má k dispozici {len(tool_names)} nástrojů: {tool_names}")
+        n8n_tools = [name for name in tool_names if 'n8n' in name.lower()]
+        if n8n_tools:
+            logger.info(f"✅ N8N nástroje nalezeny: {n8n_tools}")
+        else:
+            logger.warning(f"⚠️  Žádné N8N nástroje mezi dostupnými nástroji!")
+        return agent
+
+    @staticmethod
+    def _truncate(value: Any, limit: int = 2000) -> str:
+        """Zkrátí výstup nástroje pro odeslání klientovi"""
+        text = str(value)
+        return text if len(text) <= limit else text[:limit] + "..."
+
+    async def _agent_events(self, agent: MCPAgent, message: str, history: list) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Spustí agenta a průběžně vrací události: tokeny LLM, start/konec nástrojů a finální odpověď
+        Nepoužívá agent.run(), protože ten po každém běhu zavře všechny MCP sessions klienta
+        """
+        inputs = {"input": message, "chat_history": history}
+        async for event in agent._agent_executor.astream_events(inputs, version="v2"):
+            kind = event["event"]
+            if kind == "on_chat_model_stream":
+                content = event["data"]["chunk"].content
+                if isinstance(content, str) and content:
+                    yield {"type": "token", "content": content}
+            elif kind == "on_tool_start":
+                yield {
+                    "type": "tool_start",
+                    "tool": event["name"],
+                    "input": event["data"].get("input"),
+                    "run_id": event["run_id"]
+                }
+            elif kind == "on_tool_end":
+                self._check_tool_auth_error(event["name"], event["data"].get("output"))
+                yield {
+                    "type": "tool_end",
+                    "tool": event["name"],
+                    "output": self._truncate(event["data"].get("output")),
+                    "run_id": event["run_id"]
+                }
+            elif kind == "on_chain_end" and not event.get("parent_ids"):
+                # Konec celého AgentExecutoru - obsahuje finální odpověď
+                output = event["data"].get("output")
+                if isinstance(output, dict) and "output" in output:
+                    yield {"type": "final", "content": output["output"]}
+
     async def reinitialize_client(self):
         """Reinicializuje MCP klienta s novými tokeny"""
         self._initialized = False
+        # Zrušit servery, které se z předchozí inicializace ještě spouští
+        for task in self._startup_tasks.values():
+            task.cancel()
+        self._startup_tasks = {}
+        # Agenti v poolu i katalog drží nástroje navázané na starého klienta
+        self.agent_pool.clear()
+        self.tool_catalog.clear()
         # Zavřít staré připojení pokud existuje
         if self.client:
             try:
-                # Pokud má close metodu, zavolej ji
-                if hasattr(self.client, 'close'):
-                    await self.client.close()
+                # Sessions jsou dlouhožijící (sdílí je agenti v poolu), proto je nutné je zavřít
+                await self.client.close_all_sessions()
             except Exception as e:
                 logger.warning(f"Chyba při zavírání starého klienta: {e}")
         
         self.client = None
         await self.initialize()
 
-    async def run_query(self, message: str, session_id: str = "default", retry_on_auth_error: bool = True) -> str:
-        """
-        Spustí dotaz s podporou session a historie konverzace
-        Args:
-            message: Uživatelská zpráva
-            session_id: ID session pro udržování kontextu
-            retry_on_auth_error: Pokud True, zkusí reinicializovat při auth chybě
-        Returns:
-            Odpověď agenta
-        """
-        await self.initialize()
-        
-        # Získat nebo vytvořit session
-        # Nejdřív zkus Redis, pak fallback na memory
-        session = session_manager.load_session(session_id)
+    async def _load_session(self, session_id: str) -> Dict[str, Any]:
+        """Načte session z Redis, s fallbackem na paměť, případně vytvoří novou"""
+        session = await session_manager.load_session(session_id)
         
         if session is None:
             # Zkus memory fallback
-            if session_id in sessions:
-                session = sessions[session_id]
+            session = sessions.get(session_id)
+            if session is not None:
                 logger.info(f"📝 Načtena session z paměti: {session_id}")
             else:
                 # Nová session
@@ -249,78 +558,206 @@ class AgentService:
                 logger.info(f"🆕 Vytvořena nová session: {session_id}")
         else:
             logger.info(f"💾 Načtena session z Redis: {session_id}")
+        return session
+
+    def _build_history(self, session_id: str, session: Dict[str, Any], message: str) -> list:
+        """
+        Převede historii session na zprávy pro agenta (shrnutí + okno posledních tahů)
+        Okno se ořízne tak, aby se celý vstup vešel do CONTEXT_TOKEN_BUDGET
+        """
+        summary, window = self.history_window.select(session)
         
-        # Vytvořit nového agenta pro tento dotaz
-        logger.info(f"🤖 Vytvářím MCPAgent pro session: {session_id}")
-        agent = MCPAgent(
-            llm=self.llm,
-            client=self.client,
-            max_steps=30,
-            system_prompt=system_prompt,
-            memory_enabled=True
-        )
-        
-        # Logovat dostupné nástroje po vytvoření agenta
-        # (nástroje se vytvoří až při inicializaci, která proběhne při run())
-        logger.info(f"📋 Agent vytvořen pro session {session_id}")
+        usage = {
+            "session_id": session_id,
+            "timestamp": time.time(),
+            "system": count_tokens(system_prompt, cache=True),
+            "tools": self.tool_catalog.tokens(),
+            "summary": self.history_window.summary_tokens(summary),
+            "message": count_tokens(message)
+        }
+        history_budget = CONTEXT_TOKEN_BUDGET - sum(usage[part] for part in ("system", "tools", "summary", "message"))
+        window, dropped = trim_to_budget(window, history_budget)
         
-        # Předat historii do agenta (bez aktuální zprávy)
-        for msg in session["history"]:
-            if msg["role"] == "user":
-                agent.add_to_history(HumanMessage(content=msg["content"]))
-            elif msg["role"] == "assistant":
-                agent.add_to_history(AIMessage(content=msg["content"]))
+        usage["history"] = sum(message_tokens(msg) for msg in window)
+        usage["history_full"] = sum(message_tokens(msg) for msg in session["history"])
+        usage["history_messages"] = len(window)
+        usage["dropped_messages"] = dropped
+        usage["total"] = sum(usage[part] for part in ("system", "tools", "summary", "history", "message"))
+        usage["budget"] = CONTEXT_TOKEN_BUDGET
+        self.token_usage.append(usage)
         
-        # Spustit agenta s aktuální zprávou - pokusit se obnovit při auth chybě
+        logger.info(
+            f"📊 Tokeny session {session_id}: celkem {usage['total']}/{CONTEXT_TOKEN_BUDGET} - "
+            f"systém {usage['system']}, nástroje {usage['tools']}, shrnutí {usage['summary']}, "
+            f"historie {usage['history']} ({len(window)}/{len(session['history'])} zpráv, celá {usage['history_full']}), "
+            f"dotaz {usage['message']}"
+        )
+        if dropped:
+            logger.warning(f"✂️  Session {session_id}: {dropped} zpráv vynecháno kvůli tokenovému rozpočtu")
+        return self.history_window.to_messages(summary, window)
+
+    def _schedule_summary(self, session_id: str, session: Dict[str, Any]):
+        """Pokud okno přeteklo, složí starší tahy do shrnutí na pozadí (neblokuje odpověď)"""
+        if not self.history_window.needs_fold(session) or session_id in self._summary_tasks:
+            return
+        task = asyncio.create_task(self._update_summary(session_id, session))
+        self._summary_tasks[session_id] = task
+        task.add_done_callback(lambda _: self._summary_tasks.pop(session_id, None))
+
+    async def _update_summary(self, session_id: str, session: Dict[str, Any]):
+        """Přepočítá shrnutí session a uloží ho"""
         try:
-            result = await agent.run(message)
-            
-            # Po prvním běhu logovat dostupné nástroje
-            if hasattr(agent, '_tools') and agent._tools:
-                tool_names = [tool.name for tool in agent._tools]
-                logger.info(f"🔧 Agent má k dispozici {len(tool_names)} nástrojů: {tool_names}")
-                
-                # Specificky zkontroluj n8n nástroje
-                n8n_tools = [name for name in tool_names if 'n8n' in name.lower()]
-                if n8n_tools:
-                    logger.info(f"✅ N8N nástroje nalezeny: {n8n_tools}")
-                else:
-                    logger.warning(f"⚠️  Žádné N8N nástroje mezi dostupnými nástroji!")
-            
+            folded = await self.history_window.fold(self.llm, session)
+            if folded is None:
+                return
+            summary, summary_upto = folded
+            session["summary"] = summary
+            session["summary_upto"] = summary_upto
+            if not await session_manager.save_summary(session_id, summary, summary_upto):
+                logger.warning(f"⚠️  Shrnutí session {session_id} uloženo pouze do paměti (Redis nedostupný)")
         except Exception as e:
-            error_msg = str(e).lower()
-            # Pokud je to auth error (401, unauthorized, atd.), zkus reinicializovat
-            if retry_on_auth_error and any(keyword in error_msg for keyword in ['401', 'unauthorized', 'auth', 'authentication']):
-                logger.warning(f"⚠️  Detekována auth chyba, pokouším se reinicializovat s novými tokeny...")
-                await self.reinitialize_client()
-                # Zkus dotaz znovu (bez dalšího retry)
-                return await self.run_query(message, session_id, retry_on_auth_error=False)
-            else:
-                # Jiná chyba nebo už jsme zkusili retry - vyhoď výjimku
-                raise
-        
-        # Přidat uživatelskou zprávu do historie až po odpovědi
-        session["history"].append({
-            "role": "user",
-            "content": message
-        })
-        # Přidat odpověď agenta do historie
-        session["history"].append({
-            "role": "assistant",
-            "content": result
-        })
+            logger.error(f"❌ Chyba při shrnování session {session_id}: {e}")
+
+    async def _save_turn(self, session_id: str, session: Dict[str, Any], message: str, result: str):
+        """Přidá dotaz a odpověď do historie a uloží session"""
+        # Přidat uživatelskou zprávu do historie až po odpovědi, hned za ní odpověď agenta
+        turn = [
+            {"role": "user", "content": message},
+            {"role": "assistant", "content": result}
+        ]
+        session["history"].extend(turn)
         
-        # Uložit do Redis (s fallbackem do memory)
-        if not session_manager.save_session(session_id, session["history"]):
-            # Redis není dostupný, ulož do memory
-            sessions[session_id] = session
+        # Do Redis se připojí jen nový tah (s fallbackem do memory)
+        if not await session_manager.append_messages(session_id, turn):
+            # Redis není dostupný, ulož do memory (zprávy tahu se zapíšou do Redis po reconnectu)
+            sessions.put(session_id, session, pending=turn)
             logger.warning(f"⚠️  Session {session_id} uložena pouze do paměti (Redis nedostupný)")
         else:
             logger.info(f"💾 Session {session_id} uložena do Redis")
+
+    async def stream_query(
+        self,
+        message: str,
+        session_id: str = "default",
+        retry_on_auth_error: bool = True
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Spustí dotaz a průběžně vrací události běhu agenta
+        Stejný dotaz na stejnou session, který už běží, se nespouští znovu - připojí se k běžícímu
+        Args:
+            message: Uživatelská zpráva
+            session_id: ID session pro udržování kontextu
+            retry_on_auth_error: Pokud True, při auth chybě MCP serveru ho znovu připojí a dotaz zopakuje
+        Yields:
+            Dictionary s "type": token | tool_start | tool_end | response
+            Poslední událost je vždy "response" s kompletní odpovědí agenta
+            Při plném vytížení může přijít nejdřív "queued" s pozicí ve frontě
+        Raises:
+            SessionBusyError: Session zpracovává jiný dotaz a zámek se nepodařilo získat včas
+            AdmissionRejectedError: Služba je přetížená (plná fronta nebo dlouhé čekání)
+        """
+        if SESSION_COALESCE_REQUESTS:
+            events = self.coalescer.stream(
+                (session_id, message),
+                lambda: self._locked_turn(message, session_id, retry_on_auth_error)
+            )
+        else:
+            events = self._locked_turn(message, session_id, retry_on_auth_error)
+        async for event in events:
+            yield event
+
+    async def _locked_turn(self, message: str, session_id: str, retry_on_auth_error: bool) -> AsyncIterator[Dict[str, Any]]:
+        """Jeden tah konverzace - načtení session, běh agenta a uložení, vše pod zámkem session"""
+        await self.initialize()
+        if self.tool_catalog.is_stale:
+            await self._refresh_tool_catalog()
         
+        started_at = time.monotonic()
+        try:
+            async with self.session_locks.hold(session_id):
+                # Při plném vytížení dát klientovi vědět, že dotaz čeká ve frontě
+                position = self.admission.queue_position()
+                if position:
+                    yield {"type": "queued", "position": position, "retry_after": self.admission.retry_after()}
+                
+                async with self.admission.slot():
+                    # Získat nebo vytvořit session
+                    # Nejdřív zkus Redis, pak fallback na memory
+                    session = await self._load_session(session_id)
+                    # Předat historii do agenta (bez aktuální zprávy) - shrnutí starších tahů + okno posledních
+                    history = self._build_history(session_id, session, message)
+                    
+                    result = None
+                    async for event in self._run_agent(message, session_id, history, retry_on_auth_error):
+                        if event["type"] == "final":
+                            result = event["content"]
+                            continue
+                        yield event
+                    
+                    if result is None:
+                        result = "Agent completed the task without a response."
+                    
+                    await self._save_turn(session_id, session, message, result)
+        except AdmissionRejectedError:
+            # Odmítnutí počítá AdmissionController
+            raise
+        except (asyncio.CancelledError, GeneratorExit):
+            # Zrušení přeruší rozpracovaná volání LLM i MCP nástrojů, tah se neuloží
+            self.run_stats["cancelled"] += 1
+            logger.info(f"🛑 Běh agenta pro session {session_id} zrušen po {time.monotonic() - started_at:.1f}s")
+            raise
+        except Exception:
+            self.run_stats["failed"] += 1
+            raise
+        self.run_stats["completed"] += 1
+        self._schedule_summary(session_id, session)
+        yield {"type": "response", "message": result, "done": True}
+
+    async def _run_agent(
+        self,
+        message: str,
+        session_id: str,
+        history: list,
+        retry_on_auth_error: bool
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Zapůjčí agenta z poolu a spustí ho s aktuální zprávou - při auth chybě MCP serveru ho znovu připojí"""
+        emitted = False
+        try:
+            async with self.agent_pool.acquire() as agent:
+                logger.info(f"🤖 Agent zapůjčen z poolu pro session: {session_id}")
+                async for event in self._agent_events(agent, message, history):
+                    if event["type"] != "final":
+                        emitted = True
+                    yield event
+        except Exception as e:
+            # Auth chyba MCP serveru a klient ještě nic nedostal - znovu připoj jen ten server a zkus to znovu
+            server_name = self._auth_error_server(e) if retry_on_auth_error and not emitted else None
+            if server_name and await self.reconnect_server(server_name):
+                logger.warning(f"⚠️  Auth chyba serveru '{server_name}', server znovu připojen s novými tokeny")
+                # Zkus dotaz znovu (bez dalšího retry)
+                async for event in self._run_agent(message, session_id, history, retry_on_auth_error=False):
+                    yield event
+                return
+            # Jiná chyba nebo už jsme zkusili retry - vyhoď výjimku
+            raise
+
+    async def run_query(self, message: str, session_id: str = "default", retry_on_auth_error: bool = True) -> str:
+        """
+        Spustí dotaz s podporou session a historie konverzace
+        Args:
+            message: Uživatelská zpráva
+            session_id: ID session pro udržování kontextu
+            retry_on_auth_error: Pokud True, při auth chybě MCP serveru ho znovu připojí a dotaz zopakuje
+        Returns:
+            Odpověď agenta
+        """
+        result = ""
+        async for event in self.stream_query(message, session_id, retry_on_auth_error):
+            if event["type"] == "response":
+                result = event["message"]
         return result
 
-    def get_session_history(self, session_id: str = "default") -> list:
+    async def get_session_history(self, session_id: str = "default") -> list:
         """
         Získá historii konverzace pro danou session
         Args:
@@ -329,27 +766,27 @@ class AgentService:
             Seznam zpráv v historii
         """
         # Zkus Redis
-        session = session_manager.load_session(session_id)
+        session = await session_manager.load_session(session_id)
         if session:
             return session["history"]
         
         # Fallback na memory
-        if session_id in sessions:
-            return sessions[session_id]["history"]
+        session = sessions.get(session_id)
+        if session is not None:
+            return session["history"]
         return []
 
-    def clear_session(self, session_id: str = "default"):
+    async def clear_session(self, session_id: str = "default"):
         """
         Vymaže session a její historii
         Args:
             session_id: ID session k vymazání
         """
         # Smaž z Redis
-        session_manager.delete_session(session_id)
+        await session_manager.delete_session(session_id)
         
         # Smaž z memory
-        if session_id in sessions:
-            del sessions[session_id]
+        sessions.pop(session_id)
 
 # Singleton instance agenta
 _agent_service_instance = None
@@ -0,0 +1,122 @@
+"""
+Agent Pool pro JARVIS
+Drží omezený počet předehřátých MCPAgentů, aby se nástroje nemusely objevovat a obalovat při každém dotazu
+"""
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Tuple
+
+from mcp_use import MCPAgent
+
+logger = logging.getLogger(__name__)
+
+
+class AgentPool:
+    """Omezený pool znovupoužitelných MCPAgentů s vyřazováním nečinných instancí"""
+
+    def __init__(
+        self,
+        factory: Callable[[], Awaitable[MCPAgent]],
+        max_size: int = 4,
+        idle_seconds: int = 900
+    ):
+        """
+        Inicializace poolu
+
+        Args:
+            factory: Async funkce, která vytvoří a inicializuje nového agenta
+            max_size: Maximální počet agentů (zapůjčených i nečinných) - další zapůjčení počká na vrácení
+            idle_seconds: Po kolika sekundách nečinnosti se agent z poolu vyřadí
+        """
+        self._factory = factory
+        self.max_size = max_size
+        self.idle_seconds = idle_seconds
+        # LIFO seznam (agent, čas vrácení) - naposledy použitý agent jde ven jako první
+        self._idle: List[Tuple[MCPAgent, float]] = []
+        # Generace se zvýší při clear(), agenti ze starší generace se do poolu nevrací
+        self._generation = 0
+        self._in_use = 0
+        # Zapůjčení je omezené - nárazová zátěž nevytvoří víc než max_size agentů
+        self._slots = asyncio.Semaphore(max_size)
+        self._waiting = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _evict_idle(self):
+        """Vyřadí agenty, kteří byli nečinní déle než idle_seconds"""
+        cutoff = time.monotonic() - self.idle_seconds
+        fresh = [(agent, returned_at) for agent, returned_at in self._idle if returned_at >= cutoff]
+        evicted = len(self._idle) - len(fresh)
+        if evicted:
+            self.evictions += evicted
+            logger.info(f"♻️  Vyřazeno {evicted} nečinných agentů z poolu")
+        self._idle = fresh
+
+    @staticmethod
+    def _reset_agent(agent: MCPAgent):
+        """Vrátí agenta do čistého stavu před dalším použitím"""
+        agent.clear_conversation_history()
+        agent.tools_used_names = []
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[MCPAgent]:
+        """
+        Zapůjčí agenta z poolu (nebo vytvoří nového) a po použití ho vrátí
+        Je-li zapůjčeno max_size agentů, počká, až se některý vrátí
+
+        Agent, jehož běh skončil výjimkou, se do poolu nevrací.
+        """
+        self._waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+        try:
+            self._evict_idle()
+            generation = self._generation
+
+            if self._idle:
+                agent, _ = self._idle.pop()
+                self.hits += 1
+            else:
+                self.misses += 1
+                agent = await self._factory()
+
+            self._in_use += 1
+            healthy = False
+            try:
+                yield agent
+                healthy = True
+            finally:
+                self._in_use -= 1
+                if healthy and generation == self._generation and len(self._idle) < self.max_size:
+                    self._reset_agent(agent)
+                    self._idle.append((agent, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    def clear(self):
+        """Zahodí všechny nečinné agenty (např. po reinicializaci MCP klienta)"""
+        self._generation += 1
+        self.evictions += len(self._idle)
+        self._idle = []
+
+    def stats(self) -> Dict[str, Any]:
+        """Vrátí statistiky poolu pro /health"""
+        self._evict_idle()
+        total = self.hits + self.misses
+        return {
+            "max_size": self.max_size,
+            "idle": len(self._idle),
+            "in_use": self._in_use,
+            "waiting": self._waiting,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / total, 3) if total else None,
+            "idle_seconds": self.idle_seconds
+        }
@@ -0,0 +1,121 @@
+"""
+History Window pro JARVIS
+Do agenta jde jen posledních N tahů doslova, starší tahy se průběžně skládají do shrnutí uloženého se session
+"""
+
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain.schema import AIMessage, HumanMessage, SystemMessage
+
+from token_accounting import count_tokens
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = """Jsi pomocník, který udržuje stručné shrnutí dlouhé konverzace mezi uživatelem a asistentem JARVIS.
+Dostaneš dosavadní shrnutí a nové zprávy. Vrať aktualizované shrnutí v češtině (max. 15 odrážek).
+Zachovej fakta, rozhodnutí, jména, ID (úkolů, projektů, stránek, workflow), data a otevřené požadavky uživatele.
+Vynech zdvořilosti a detaily, které už nejsou potřeba. Vrať pouze shrnutí."""
+
+SUMMARY_INTRO = "Shrnutí předchozí části naší konverzace:\n"
+SUMMARY_ACK = "Rozumím, navážu na předchozí konverzaci."
+
+
+class HistoryWindow:
+    """Okno historie konverzace s průběžně aktualizovaným shrnutím starších tahů"""
+
+    def __init__(self, window_turns: int = 10, batch_turns: int = 5):
+        """
+        Inicializace okna
+
+        Args:
+            window_turns: Kolik posledních tahů (dotaz + odpověď) jde do agenta doslova, 0 = celá historie
+            batch_turns: O kolik tahů musí okno přetéct, než se shrnutí přepočítá (hystereze)
+        """
+        self.window_turns = window_turns
+        self.batch_turns = batch_turns
+
+    @property
+    def enabled(self) -> bool:
+        return self.window_turns > 0
+
+    def needs_fold(self, session: Dict[str, Any]) -> bool:
+        """True pokud nesložené tahy přetekly okno alespoň o batch_turns"""
+        if not self.enabled:
+            return False
+        unsummarized = len(session["history"]) - session.get("summary_upto", 0)
+        return unsummarized >= 2 * (self.window_turns + self.batch_turns)
+
+    def select(self, session: Dict[str, Any]) -> Tuple[Optional[str], List[Dict[str, str]]]:
+        """
+        Vybere shrnutí a zprávy, které jdou do agenta doslova
+
+        Returns:
+            (shrnutí nebo None, seznam zpráv)
+        """
+        history = session["history"]
+        if not self.enabled:
+            return None, history
+
+        summary_upto = min(session.get("summary_upto", 0), len(history))
+        # Nejvýše okno + dávka tahů doslova, i když shrnutí zatím zaostává
+        start = max(summary_upto, len(history) - 2 * (self.window_turns + self.batch_turns))
+        if start > summary_upto:
+            logger.warning(f"⚠️  Shrnutí zaostává, {start - summary_upto} zpráv vynecháno z kontextu")
+        return session.get("summary") or None, history[start:]
+
+    @staticmethod
+    def summary_tokens(summary: Optional[str]) -> int:
+        """Tokeny, které v promptu zabere shrnutí (včetně úvodu a potvrzení)"""
+        if not summary:
+            return 0
+        return count_tokens(SUMMARY_INTRO + summary) + count_tokens(SUMMARY_ACK, cache=True)
+
+    @staticmethod
+    def to_messages(summary: Optional[str], history: List[Dict[str, str]]) -> list:
+        """Převede shrnutí a historii na zprávy pro agenta"""
+        messages = []
+        if summary:
+            # Shrnutí jako dvojice dotaz/odpověď, aby se zachovalo střídání rolí
+            messages.append(HumanMessage(content=SUMMARY_INTRO + summary))
+            messages.append(AIMessage(content=SUMMARY_ACK))
+        for msg in history:
+            if msg["role"] == "user":
+                messages.append(HumanMessage(content=msg["content"]))
+            elif msg["role"] == "assistant":
+                messages.append(AIMessage(content=msg["content"]))
+        return messages
+
+    async def fold(self, llm, session: Dict[str, Any]) -> Optional[Tuple[str, int]]:
+        """
+        Složí tahy, které vypadly z okna, do shrnutí (inkrementálně - k předchozímu shrnutí přidá jen nové zprávy)
+
+        Args:
+            llm: LangChain chat model pro shrnutí
+            session: Session s "history", volitelně "summary" a "summary_upto"
+
+        Returns:
+            (nové shrnutí, index první nesložené zprávy) nebo None, pokud není co skládat
+        """
+        if not self.needs_fold(session):
+            return None
+
+        history = session["history"]
+        summary_upto = session.get("summary_upto", 0)
+        new_upto = len(history) - 2 * self.window_turns
+        transcript = "\n".join(
+            f"{'Uživatel' if msg['role'] == 'user' else 'JARVIS'}: {msg['content']}"
+            for msg in history[summary_upto:new_upto]
+        )
+        previous = session.get("summary") or "(zatím žádné)"
+
+        response = await llm.ainvoke([
+            SystemMessage(content=SUMMARY_PROMPT),
+            HumanMessage(content=f"Dosavadní shrnutí:\n{previous}\n\nNové zprávy:\n{transcript}")
+        ])
+        summary = response.content.strip() if isinstance(response.content, str) else str(response.content)
+        logger.info(
+            f"🗜️  Shrnuto {new_upto - summary_upto} zpráv do {count_tokens(summary)} tokenů "
+            f"(složeno celkem {new_upto}/{len(history)})"
+        )
+        return summary, new_upto
@@ -0,0 +1,144 @@
+"""
+MCP Config pro JARVIS
+Sestavení konfigurace MCP serverů - sdílí ji API workery i MCP host (sidecar pro režim s více workery)
+"""
+
+import logging
+import os
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Název Notion serveru v konfiguraci (připojuje se s access tokenem, který se obnovuje)
+NOTION_SERVER = "Notion"
+TICKTICK_SERVER = "TickTick"
+
+# Servery, které si access token obnovují samy (při 401) - jejich restart by auth chybu nevyřešil
+SELF_REFRESHING_SERVERS = frozenset({TICKTICK_SERVER})
+
+# Nastavení TickTick MCP serveru, která se mu předávají z prostředí API
+# (stdio server dědí jen základní proměnné jako PATH a HOME)
+TICKTICK_SERVER_ENV = (
+    "TICKTICK_FETCH_CONCURRENCY",
+    "TICKTICK_CACHE_TTL",
+    "TICKTICK_CONNECT_TIMEOUT",
+    "TICKTICK_READ_TIMEOUT",
+    "TICKTICK_MAX_RETRIES"
+)
+
+
+def build_mcp_config(
+    linkup_api_key: str,
+    n8n_api_url: str,
+    n8n_api_key: str,
+    notion_token: Optional[str] = None,
+    host_url: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Sestaví konfiguraci MCP serverů pro MCPClient.from_dict
+
+    Args:
+        linkup_api_key: API klíč pro Linkup
+        n8n_api_url: URL n8n instance
+        n8n_api_key: API klíč n8n
+        notion_token: Access token Notion (bez tokenu se Notion vynechá)
+        host_url: URL MCP hostu - lokální (stdio) servery se pak nespouští, ale připojí se přes streamable HTTP
+    """
+    servers = build_local_servers(linkup_api_key, n8n_api_url, n8n_api_key)
+    if host_url:
+        logger.info(f"🔌 Lokální MCP servery běží v MCP hostu: {host_url}")
+        servers = {name: hosted_server_config(host_url, name) for name in servers}
+    config = {"mcpServers": servers}
+
+    # Přidat Notion pouze pokud máme validní token
+    # Používáme headers místo auth, abychom se vyhnuli automatickému OAuth flow
+    if notion_token:
+        config["mcpServers"][NOTION_SERVER] = notion_server_config(notion_token)
+    else:
+        logger.warning("⚠️  Notion není nakonfigurován - chybí access token")
+
+    return config
+
+
+def notion_server_config(notion_token: str) -> Dict[str, Any]:
+    """Konfigurace Notion serveru - headers místo auth, abychom se vyhnuli automatickému OAuth flow"""
+    return {
+        "url": "https://mcp.notion.com/mcp",
+        "headers": {
+            "Authorization": f"Bearer {notion_token}"
+        }
+    }
+
+
+def build_local_servers(linkup_api_key: str, n8n_api_url: str, n8n_api_key: str) -> Dict[str, Dict[str, Any]]:
+    """Sestaví konfiguraci lokálních MCP serverů, které se spouští jako procesy (stdio)"""
+    # Zjisti, jestli jsou jednotlivé MCP servery povolené
+    enable_whatsapp = os.getenv("ENABLE_WHATSAPP", "false").lower() == "true"
+    enable_n8n = os.getenv("ENABLE_N8N", "true").lower() == "true"
+
+    servers = {
+        TICKTICK_SERVER: {
+            "command": "python",
+            "args": ["src/ticktick-mcp/server.py", "run"],
+            "env": {name: os.environ[name] for name in TICKTICK_SERVER_ENV if name in os.environ}
+        },
+        "linkup": {
+            "command": "npx",
+            "args": ["-y", "linkup-mcp-server", "apiKey=" + linkup_api_key]
+        },
+        "fetch": {
+            "command": "npx",
+            "args": [
+                "mcp-fetch-server"
+            ],
+            "env": {
+                "max_length": "50000"
+            }
+        }
+    }
+
+    # Přidat WhatsApp pouze pokud je povolen
+    if enable_whatsapp:
+        logger.info("✅ Přidávám WhatsApp MCP server")
+        servers["WhatsApp"] = {
+            "command": "uv",
+            "args": [
+                "--directory",
+                "/app/whatsapp-mcp/whatsapp-mcp-server",
+                "run",
+                "main.py"
+            ]
+        }
+    else:
+        logger.info("⏭️  WhatsApp MCP server je zakázán (ENABLE_WHATSAPP=false)")
+
+    # Přidat N8N pouze pokud je povolen
+    if enable_n8n:
+        logger.info("✅ Přidávám N8N MCP server")
+        servers["n8n"] = {
+            "command": "n8n-mcp",
+            "args": [],
+            "env": {
+                "MCP_MODE": "stdio",
+                "LOG_LEVEL": "error",
+                "DISABLE_CONSOLE_OUTPUT": "true",
+                "N8N_API_URL": f"{n8n_api_url}",
+                "N8N_API_KEY": f"{n8n_api_key}"
+            }
+        }
+    else:
+        logger.info("⏭️  N8N MCP server je zakázán (ENABLE_N8N=false)")
+
+    return servers
+
+
+def hosted_server_config(host_url: str, server_name: str) -> Dict[str, Any]:
+    """Konfigurace připojení k serveru hostovanému v MCP hostu"""
+    return {
+        "url": f"{host_url.rstrip('/')}/{server_name}/mcp",
+        # Lokální host nemá OAuth - bez auth se přeskočí OAuth discovery při připojení
+        "auth": None,
+        "timeout": 30,
+        # Volání nástrojů (n8n workflow, fetch) mohou trvat dlouho
+        "sse_read_timeout": 30 * 60
+    }
@@ -0,0 +1,206 @@
+"""
+MCP Supervisor pro JARVIS
+Hlídá každý MCP server zvlášť (pravidelný ping s měřením latence) a při výpadku restartuje jen ten jeden server
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Jak často kontrolovat servery, timeout pingu a nejdelší prodleva mezi pokusy o restart (sekundy)
+MCP_HEALTH_CHECK_INTERVAL = float(os.getenv("MCP_HEALTH_CHECK_INTERVAL", "30"))
+MCP_HEALTH_CHECK_TIMEOUT = float(os.getenv("MCP_HEALTH_CHECK_TIMEOUT", "10"))
+MCP_RESTART_BACKOFF_MAX = float(os.getenv("MCP_RESTART_BACKOFF_MAX", "300"))
+
+# Kolik neúspěšných pingů za sebou vede k restartu (odpojený server se restartuje hned)
+FAILURE_THRESHOLD = 2
+RESTART_BACKOFF_INITIAL = 5.0
+
+
+class ServerSupervisor:
+    """Health check MCP serverů a restart jednotlivých serverů s exponenciálním backoffem"""
+
+    def __init__(
+        self,
+        get_client: Callable[[], Any],
+        restart_server: Callable[[str], Awaitable[None]],
+        is_starting: Callable[[str], bool] = lambda server_name: False,
+        interval: float = MCP_HEALTH_CHECK_INTERVAL,
+        ping_timeout: float = MCP_HEALTH_CHECK_TIMEOUT,
+        backoff_max: float = MCP_RESTART_BACKOFF_MAX
+    ):
+        """
+        Inicializace supervisoru
+
+        Args:
+            get_client: Vrací aktuálního MCPClient (None během reinicializace)
+            restart_server: Restartuje jeden server podle názvu (při neúspěchu vyhodí výjimku)
+            is_starting: True pro servery, které se právě spouští (ty se nekontrolují)
+            interval: Perioda kontroly v sekundách
+            ping_timeout: Timeout jednoho pingu v sekundách
+            backoff_max: Nejdelší prodleva mezi pokusy o restart v sekundách
+        """
+        self.get_client = get_client
+        self.restart_server = restart_server
+        self.is_starting = is_starting
+        self.interval = interval
+        self.ping_timeout = ping_timeout
+        self.backoff_max = backoff_max
+        # server_name -> stav serveru (exportováno na /health)
+        self._servers: Dict[str, Dict[str, Any]] = {}
+        self._restart_locks: Dict[str, asyncio.Lock] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Spustí pravidelnou kontrolu na pozadí (opakované volání nic nedělá)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.check_all()
+            except Exception as e:
+                logger.error(f"❌ Chyba při kontrole MCP serverů: {e}")
+
+    def _state(self, server_name: str) -> Dict[str, Any]:
+        if server_name not in self._servers:
+            self._servers[server_name] = {
+                "status": "unknown",
+                "latency_ms": None,
+                "avg_latency_ms": None,
+                "checked_at": None,
+                "failures": 0,
+                "restarts": 0,
+                "last_error": None,
+                "backoff": RESTART_BACKOFF_INITIAL,
+                "next_restart_at": 0.0
+            }
+            self._restart_locks[server_name] = asyncio.Lock()
+        return self._servers[server_name]
+
+    async def check_all(self):
+        """Zkontroluje všechny servery paralelně - pomalý server nezdrží kontrolu ostatních"""
+        client = self.get_client()
+        if client is None:
+            return
+        await asyncio.gather(*(self.check(client, server_name) for server_name in client.get_server_names()))
+
+    async def check(self, client, server_name: str):
+        """Pingne server; po opakovaném selhání (nebo když není připojen) ho restartuje"""
+        if self.is_starting(server_name):
+            return
+        state = self._state(server_name)
+        if self._restart_locks[server_name].locked():
+            return
+
+        session = client.sessions.get(server_name)
+        error = await self._ping(session, state)
+        state["checked_at"] = time.time()
+        if error is None:
+            if state["failures"]:
+                logger.info(f"💚 Server '{server_name}' je opět v pořádku")
+            state["status"] = "healthy"
+            state["failures"] = 0
+            state["last_error"] = None
+            state["backoff"] = RESTART_BACKOFF_INITIAL
+            return
+
+        state["failures"] += 1
+        state["last_error"] = error
+        if session is not None and session.is_connected and state["failures"] < FAILURE_THRESHOLD:
+            state["status"] = "degraded"
+            logger.warning(f"⚠️  Server '{server_name}' neodpověděl na ping: {error}")
+            return
+
+        state["status"] = "down"
+        await self.restart(server_name)
+
+    async def _ping(self, session, state: Dict[str, Any]) -> Optional[str]:
+        """Pingne server a zaznamená latenci; vrátí popis chyby nebo None"""
+        if session is None:
+            return "server nemá session"
+        if not session.is_connected:
+            return "server není připojen"
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(session.connector.client_session.send_ping(), timeout=self.ping_timeout)
+        except asyncio.TimeoutError:
+            return f"ping timeout ({self.ping_timeout:.0f}s)"
+        except Exception as e:
+            return str(e) or type(e).__name__
+        latency = round((time.monotonic() - started) * 1000, 1)
+        state["latency_ms"] = latency
+        average = state["avg_latency_ms"]
+        state["avg_latency_ms"] = latency if average is None else round(0.8 * average + 0.2 * latency, 1)
+        return None
+
+    async def restart(self, server_name: str, force: bool = False) -> bool:
+        """
+        Restartuje jeden server - během backoffu po neúspěšném pokusu nic nedělá (pokud není force)
+
+        Returns:
+            True pokud restart proběhl úspěšně
+        """
+        state = self._state(server_name)
+        lock = self._restart_locks[server_name]
+        if lock.locked():
+            return False
+        async with lock:
+            now = time.monotonic()
+            if not force and now < state["next_restart_at"]:
+                return False
+
+            logger.warning(f"🔁 Restartuji MCP server '{server_name}' ({state['last_error'] or 'vyžádáno'})")
+            state["status"] = "restarting"
+            try:
+                await self.restart_server(server_name)
+            except Exception as e:
+                # Další pokus až po backoffu, prodleva se při každém neúspěchu zdvojnásobí
+                state["status"] = "down"
+                state["last_error"] = str(e) or type(e).__name__
+                state["next_restart_at"] = time.monotonic() + state["backoff"]
+                logger.error(
+                    f"❌ Restart serveru '{server_name}' selhal: {state['last_error']} "
+                    f"(další pokus za {state['backoff']:.0f}s)"
+                )
+                state["backoff"] = min(state["backoff"] * 2, self.backoff_max)
+                return False
+
+            state["status"] = "healthy"
+            state["failures"] = 0
+            state["last_error"] = None
+            state["restarts"] += 1
+            state["next_restart_at"] = 0.0
+            logger.info(f"✅ MCP server '{server_name}' restartován za {time.monotonic() - now:.1f}s")
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        """Vrátí stav serverů pro /health"""
+        now = time.monotonic()
+        return {
+            server_name: {
+                "status": state["status"],
+                "latency_ms": state["latency_ms"],
+                "avg_latency_ms": state["avg_latency_ms"],
+                "failures": state["failures"],
+                "restarts": state["restarts"],
+                "last_error": state["last_error"],
+                "next_restart_in": round(state["next_restart_at"] - now, 1) if state["next_restart_at"] > now else None
+            }
+            for server_name, state in self._servers.items()
+        }
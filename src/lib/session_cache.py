@@ -0,0 +1,212 @@
+"""
+Session Cache pro JARVIS
+Omezená in-process LRU cache sessions (počet záznamů, celková velikost historie a TTL od poslední aktivity)
+Slouží jako paměťový fallback, když Redis není dostupný
+"""
+
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class SessionCache:
+    """LRU cache sessions omezená počtem záznamů, bajty historie a stářím"""
+
+    def __init__(self, max_entries: int = 1000, max_bytes: int = 50 * 1024 * 1024, ttl_seconds: int = 7 * 24 * 60 * 60):
+        """
+        Inicializace cache
+
+        Args:
+            max_entries: Maximální počet sessions v cache
+            max_bytes: Maximální celková velikost historií (JSON) v bajtech
+            ttl_seconds: Po kolika sekundách bez aktivity session z cache vypadne
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        # session_id -> {"session", "size", "touched_at", "pending"} (nejstarší aktivita první)
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        # Vyřazené sessions, jejichž zprávy se ještě nestihly zapsat do Redis
+        self.lost_pending = 0
+
+    @staticmethod
+    def message_size(message: Dict[str, Any]) -> int:
+        """Velikost zprávy v bajtech (JSON, stejně jako se ukládá do Redis)"""
+        return len(json.dumps(message, ensure_ascii=False).encode("utf-8"))
+
+    @classmethod
+    def _size_of(cls, messages: List[Dict[str, Any]]) -> int:
+        return sum(cls.message_size(message) for message in messages)
+
+    def _remove(self, session_id: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.pop(session_id, None)
+        if entry is not None:
+            self._bytes -= entry["size"]
+        return entry
+
+    def _drop(self, session_id: str, reason: str):
+        """Vyřadí session z cache a započítá ji do statistik"""
+        entry = self._remove(session_id)
+        if entry is None:
+            return
+        if reason == "expired":
+            self.expirations += 1
+        else:
+            self.evictions += 1
+        if entry["pending"]:
+            self.lost_pending += 1
+            logger.warning(f"⚠️  Session {session_id} vyřazena z paměti ({reason}) dřív, než se zapsala do Redis")
+
+    def _expire(self):
+        """Vyřadí sessions neaktivní déle než ttl_seconds (jsou na začátku LRU pořadí)"""
+        cutoff = time.monotonic() - self.ttl_seconds
+        while self._entries:
+            session_id, entry = next(iter(self._entries.items()))
+            if entry["touched_at"] >= cutoff:
+                break
+            self._drop(session_id, "expired")
+
+    def _enforce_limits(self):
+        """Vyřazuje nejdéle nepoužité sessions, dokud cache nesplňuje limity"""
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            session_id = next(iter(self._entries))
+            self._drop(session_id, "evicted")
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Vrátí session z cache (a označí ji jako naposledy použitou) nebo None"""
+        self._expire()
+        entry = self._entries.get(session_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        entry["touched_at"] = time.monotonic()
+        self._entries.move_to_end(session_id)
+        self.hits += 1
+        return entry["session"]
+
+    def put(
+        self,
+        session_id: str,
+        session: Dict[str, Any],
+        pending: Optional[List[Dict[str, str]]] = None,
+        size: Optional[int] = None
+    ):
+        """
+        Uloží session do cache
+
+        Args:
+            session_id: ID session
+            session: Session s "history"
+            pending: Nové zprávy, které se zatím nepodařilo zapsat do Redis (připojí se k dříve čekajícím).
+                Pokud je v cache tentýž objekt session, volající ho o tyto zprávy už rozšířil na místě -
+                velikost se pak jen navýší o jejich velikost
+            size: Velikost historie v bajtech, pokud ji volající zná (jinak se spočítá)
+        """
+        previous = self._remove(session_id)
+        waiting = previous["pending"] if previous else []
+        if pending:
+            waiting = waiting + list(pending)
+
+        if size is None:
+            if previous is not None and previous["session"] is session and pending:
+                size = previous["size"] + self._size_of(pending)
+            else:
+                size = self._size_of(session.get("history", []))
+        self._entries[session_id] = {
+            "session": session,
+            "size": size,
+            "touched_at": time.monotonic(),
+            "pending": waiting
+        }
+        self._bytes += size
+        self._expire()
+        self._enforce_limits()
+
+    def append(self, session_id: str, messages: List[Dict[str, Any]], size: Optional[int] = None, **fields) -> bool:
+        """
+        Připojí zprávy na konec historie session v cache (na místě, bez kopie historie)
+        Velikost se navýší jen o nové zprávy
+
+        Args:
+            session_id: ID session
+            messages: Nové zprávy
+            size: Velikost nových zpráv v bajtech, pokud ji volající zná
+            **fields: Další pole session, která se přepíšou (např. version)
+
+        Returns:
+            False pokud session v cache není
+        """
+        entry = self._entries.get(session_id)
+        if entry is None:
+            return False
+        entry["session"]["history"].extend(messages)
+        entry["session"].update(fields)
+        if size is None:
+            size = self._size_of(messages)
+        entry["size"] += size
+        self._bytes += size
+        entry["touched_at"] = time.monotonic()
+        self._entries.move_to_end(session_id)
+        self._enforce_limits()
+        return True
+
+    def peek(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Vrátí session z cache bez započítání do statistik a bez změny LRU pořadí"""
+        entry = self._entries.get(session_id)
+        return entry["session"] if entry else None
+
+    def pop(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Odebere session z cache a vrátí ji"""
+        entry = self._remove(session_id)
+        return entry["session"] if entry else None
+
+    def pending_items(self) -> List[Tuple[str, List[Dict[str, str]]]]:
+        """Vrátí sessions se zprávami, které ještě nejsou zapsané v Redis"""
+        self._expire()
+        return [(session_id, list(entry["pending"])) for session_id, entry in self._entries.items() if entry["pending"]]
+
+    def mark_written(self, session_id: str, count: int):
+        """
+        Označí prvních count čekajících zpráv session jako zapsané do Redis
+        Session, které už nic nečeká, se z cache odebere - zdrojem pravdy je znovu Redis
+        """
+        entry = self._entries.get(session_id)
+        if entry is None:
+            return
+        entry["pending"] = entry["pending"][count:]
+        if not entry["pending"]:
+            self._remove(session_id)
+
+    def __contains__(self, session_id: str) -> bool:
+        self._expire()
+        return session_id in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """Vrátí statistiky cache pro /health"""
+        self._expire()
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "pending_sessions": sum(1 for entry in self._entries.values() if entry["pending"]),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else None,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "lost_pending": self.lost_pending
+        }
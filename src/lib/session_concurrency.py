@@ -0,0 +1,195 @@
+"""
+Session Concurrency pro JARVIS
+Zámek na session (lokální asyncio + distribuovaný přes Redis) a slučování stejných souběžných dotazů
+"""
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Hashable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SessionBusyError(RuntimeError):
+    """Session zpracovává jiný dotaz (na jiném workeru) a zámek se nepodařilo získat včas"""
+
+
+class SessionLocks:
+    """Zámky sessions - dotazy na stejnou session se zpracují postupně, i napříč workery"""
+
+    def __init__(self, session_manager, lock_ttl: float = 600, wait_timeout: float = 120):
+        """
+        Inicializace zámků
+
+        Args:
+            session_manager: SessionManager (pro distribuovaný zámek v Redis)
+            lock_ttl: Po kolika sekundách Redis zámek sám vyprší (pojistka, když worker spadne)
+            wait_timeout: Jak dlouho čekat na uvolnění zámku, než se vyhodí SessionBusyError
+        """
+        self.session_manager = session_manager
+        self.lock_ttl = lock_ttl
+        self.wait_timeout = wait_timeout
+        # session_id -> [asyncio.Lock, počet držitelů a čekajících]
+        self._local: Dict[str, List[Any]] = {}
+        self.waits = 0
+        self.busy_errors = 0
+
+    @asynccontextmanager
+    async def hold(self, session_id: str) -> AsyncIterator[None]:
+        """Drží zámek session po dobu bloku"""
+        entry = self._local.setdefault(session_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            if entry[1] > 1:
+                self.waits += 1
+                logger.info(f"⏳ Session {session_id} zpracovává jiný dotaz, čekám...")
+            try:
+                await asyncio.wait_for(entry[0].acquire(), timeout=self.wait_timeout)
+            except asyncio.TimeoutError:
+                self.busy_errors += 1
+                raise SessionBusyError(f"Session {session_id} zpracovává jiný dotaz")
+            try:
+                redis_lock = await self._acquire_distributed(session_id)
+                try:
+                    yield
+                finally:
+                    if redis_lock is not None:
+                        await self._release_distributed(session_id, redis_lock)
+            finally:
+                entry[0].release()
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                self._local.pop(session_id, None)
+
+    async def _acquire_distributed(self, session_id: str):
+        """Získá Redis zámek session (None když Redis není dostupný - stačí lokální zámek)"""
+        redis_lock = await self.session_manager.lock(session_id, timeout=self.lock_ttl, blocking_timeout=self.wait_timeout)
+        if redis_lock is None:
+            return None
+        try:
+            acquired = await redis_lock.acquire()
+        except Exception as e:
+            logger.warning(f"⚠️  Redis zámek session {session_id} nelze získat, pokračuji jen s lokálním: {e}")
+            return None
+        if not acquired:
+            self.busy_errors += 1
+            raise SessionBusyError(f"Session {session_id} zpracovává jiný dotaz na jiném workeru")
+        return redis_lock
+
+    @staticmethod
+    async def _release_distributed(session_id: str, redis_lock):
+        try:
+            await redis_lock.release()
+        except Exception as e:
+            # Zámek mezitím vypršel (dotaz běžel déle než lock_ttl) nebo Redis vypadl
+            logger.warning(f"⚠️  Redis zámek session {session_id} nelze uvolnit: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": len(self._local),
+            "waits": self.waits,
+            "busy_errors": self.busy_errors
+        }
+
+
+class _InflightRun:
+    """Jeden běžící dotaz, jehož události může odebírat více klientů"""
+
+    def __init__(self):
+        self.events: List[Dict[str, Any]] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def publish(self, event: Dict[str, Any]):
+        self.events.append(event)
+        self._notify()
+
+    def finish(self, error: Optional[BaseException] = None):
+        self.done = True
+        self.error = error
+        self._notify()
+
+    def _notify(self):
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def subscribe(self) -> AsyncIterator[Dict[str, Any]]:
+        """Přehraje dosavadní události a pak průběžně vrací nové až do konce běhu"""
+        index = 0
+        while True:
+            while index < len(self.events):
+                # Kopie - odběratelé si do události doplňují vlastní údaje
+                yield dict(self.events[index])
+                index += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await self._changed.wait()
+
+
+class RequestCoalescer:
+    """Slučuje stejné souběžné dotazy - sdílí jeden běh agenta i jeho výsledek"""
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, _InflightRun] = {}
+        self.runs = 0
+        self.coalesced = 0
+
+    async def stream(
+        self,
+        key: Hashable,
+        producer: Callable[[], AsyncIterator[Dict[str, Any]]]
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Vrací události běhu pro daný klíč - pokud už stejný dotaz běží, připojí se k němu
+
+        Args:
+            key: Klíč dotazu (např. session_id + zpráva)
+            producer: Funkce vracející async iterátor událostí (zavolá se jen pro první dotaz)
+        """
+        run = self._inflight.get(key)
+        if run is None:
+            run = _InflightRun()
+            self._inflight[key] = run
+            self.runs += 1
+            run.task = asyncio.create_task(self._drive(key, run, producer))
+        else:
+            self.coalesced += 1
+            logger.info("🔗 Stejný dotaz už běží, připojuji se k jeho výsledku")
+
+        run.subscribers += 1
+        try:
+            async for event in run.subscribe():
+                yield event
+        finally:
+            run.subscribers -= 1
+            # Poslední odběratel odešel (zrušení, odpojení) - běh už nikdo nepotřebuje
+            if run.subscribers == 0 and not run.done and run.task is not None:
+                run.task.cancel()
+
+    async def _drive(self, key: Hashable, run: _InflightRun, producer: Callable[[], AsyncIterator[Dict[str, Any]]]):
+        """Spustí běh nezávisle na odběratelích a rozesílá jeho události"""
+        try:
+            async for event in producer():
+                run.publish(event)
+            run.finish()
+        except BaseException as e:
+            run.finish(e)
+            if not isinstance(e, Exception):
+                raise
+        finally:
+            if self._inflight.get(key) is run:
+                del self._inflight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "inflight": len(self._inflight),
+            "runs": self.runs,
+            "coalesced": self.coalesced
+        }
@@ -1,127 +1,399 @@
 """
 Session Manager pro JARVIS
 Ukládá konverzace do Redis s automatickým TTL a cleanup
+Používá asyncio klienta (redis.asyncio) se sdíleným ConnectionPoolem, aby neblokoval event loop
 """
 
 import json
 import logging
 import os
-from typing import Dict, Any, Optional, List
+import time
+from typing import Awaitable, Callable, Dict, Any, Optional, List
 from datetime import datetime, timedelta
 import redis
+import redis.asyncio as aioredis
+from session_cache import SessionCache
 
 logger = logging.getLogger(__name__)
 
+# Klíč označující dokončenou migraci na append-only historii
+MIGRATION_MARKER_KEY = "jarvis:migrations:history_list"
+
+# Sorted set se všemi sessions, skóre = čas poslední aktivity (unix timestamp)
+SESSION_INDEX_KEY = "jarvis:sessions:index"
+
+# Počet příkazů, které _queue_load přidá do pipeline pro jednu session
+LOAD_PIPELINE_COMMANDS = 5
+
 class SessionManager:
-    """Správa sessions v Redis"""
+    """Správa sessions v Redis (asyncio)"""
     
-    def __init__(self, redis_url: Optional[str] = None, ttl_days: int = 7):
+    def __init__(
+        self,
+        redis_url: Optional[str] = None,
+        ttl_days: int = 7,
+        pool_size: Optional[int] = None,
+        socket_timeout: Optional[float] = None,
+        connect_timeout: Optional[float] = None,
+        reconnect_interval: Optional[float] = None
+    ):
         """
         Inicializace SessionManageru
         
         Args:
             redis_url: URL pro připojení k Redis (default: localhost)
             ttl_days: Kolik dní má session přežít bez aktivity (default: 7)
+            pool_size: Maximální počet spojení ve sdíleném poolu (default: REDIS_POOL_SIZE nebo 20)
+            socket_timeout: Timeout jedné operace v sekundách (default: REDIS_SOCKET_TIMEOUT nebo 5)
+            connect_timeout: Timeout navázání spojení v sekundách (default: REDIS_CONNECT_TIMEOUT nebo 5)
+            reconnect_interval: Jak často zkoušet znovu připojení, když Redis neběží (default: REDIS_RECONNECT_INTERVAL nebo 30)
         """
         self.redis_url = redis_url or os.getenv("REDIS_URL", "redis://localhost:6379")
         self.ttl_seconds = ttl_days * 24 * 60 * 60  # Převod na sekundy
-        self.redis_client: Optional[redis.Redis] = None
+        self.pool_size = pool_size or int(os.getenv("REDIS_POOL_SIZE", "20"))
+        self.socket_timeout = socket_timeout or float(os.getenv("REDIS_SOCKET_TIMEOUT", "5"))
+        self.connect_timeout = connect_timeout or float(os.getenv("REDIS_CONNECT_TIMEOUT", "5"))
+        self.reconnect_interval = reconnect_interval or float(os.getenv("REDIS_RECONNECT_INTERVAL", "30"))
+        self.pool: Optional[aioredis.ConnectionPool] = None
+        self.redis_client: Optional[aioredis.Redis] = None
         self._connected = False
+        self._next_connect_attempt = 0.0
+        # Async callbacky volané po každém úspěšném (znovu)připojení
+        self._reconnect_listeners: List[Callable[[], Awaitable[None]]] = []
+        # Lokální read-through cache historií - platnost se ověřuje podle verze v metadatech session
+        self.local_cache = SessionCache(
+            max_entries=int(os.getenv("SESSION_CACHE_MAX_ENTRIES", "256")),
+            max_bytes=int(os.getenv("SESSION_CACHE_MAX_BYTES", str(16 * 1024 * 1024))),
+            ttl_seconds=self.ttl_seconds
+        )
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_stale = 0
+        
+    def add_reconnect_listener(self, listener: Callable[[], Awaitable[None]]):
+        """Zaregistruje async callback, který se zavolá po (znovu)připojení k Redis"""
+        self._reconnect_listeners.append(listener)
         
-    def connect(self):
+    async def connect(self):
         """Připojení k Redis"""
         if self._connected:
             return
+        self._next_connect_attempt = time.monotonic() + self.reconnect_interval
             
         try:
-            self.redis_client = redis.from_url(
-                self.redis_url,
-                decode_responses=True,  # Automaticky dekóduj do stringu
-                socket_connect_timeout=5,
-                socket_timeout=5
-            )
+            if self.pool is None:
+                self.pool = aioredis.ConnectionPool.from_url(
+                    self.redis_url,
+                    decode_responses=True,  # Automaticky dekóduj do stringu
+                    max_connections=self.pool_size,
+                    socket_connect_timeout=self.connect_timeout,
+                    socket_timeout=self.socket_timeout
+                )
+                self.redis_client = aioredis.Redis(connection_pool=self.pool)
             # Test připojení
-            self.redis_client.ping()
+            await self.redis_client.ping()
             self._connected = True
-            logger.info(f"✅ Připojeno k Redis: {self.redis_url}")
+            logger.info(f"✅ Připojeno k Redis: {self.redis_url} (pool: {self.pool_size} spojení)")
+            await self.migrate_legacy_sessions()
+            for listener in self._reconnect_listeners:
+                try:
+                    await listener()
+                except Exception as e:
+                    logger.error(f"❌ Chyba v reconnect listeneru: {e}")
         except redis.ConnectionError as e:
             logger.error(f"❌ Nepodařilo se připojit k Redis: {e}")
             logger.warning("⚠️  Sessions budou pouze v paměti (zmizí po restartu)")
-            self.redis_client = None
             self._connected = False
         except Exception as e:
             logger.error(f"❌ Chyba při připojování k Redis: {e}")
-            self.redis_client = None
             self._connected = False
+
+    async def _ensure_connected(self) -> bool:
+        """
+        Vrátí True pokud je Redis připojen
+        Když připojen není, zkusí se znovu připojit - nejvýše jednou za reconnect_interval
+        """
+        if self._connected:
+            return True
+        if time.monotonic() >= self._next_connect_attempt:
+            await self.connect()
+        return self._connected
+
+    def _handle_error(self, error: Exception):
+        """Při výpadku spojení označí Redis jako nedostupný (další operace zkusí reconnect)"""
+        if isinstance(error, (redis.ConnectionError, redis.TimeoutError)):
+            self._connected = False
+
+    async def close(self):
+        """Uzavře pool spojení"""
+        if self.pool is not None:
+            await self.pool.disconnect()
+        self._connected = False
     
     def _get_key(self, session_id: str) -> str:
-        """Vytvoří Redis klíč pro session"""
+        """Vytvoří Redis klíč pro session (původní formát - celý JSON blob, jen pro migraci)"""
         return f"jarvis:session:{session_id}"
     
-    def save_session(self, session_id: str, history: List[Dict[str, str]]) -> bool:
+    def _history_key(self, session_id: str) -> str:
+        """Redis list s historií - jedna zpráva = jeden JSON záznam"""
+        return f"jarvis:history:{session_id}"
+    
+    def _meta_key(self, session_id: str) -> str:
+        """Redis hash s metadaty session (updated_at, message_count, version)"""
+        return f"jarvis:session_meta:{session_id}"
+    
+    def _expired_before(self) -> float:
+        """Skóre, pod kterým už session v indexu vypršela (TTL se počítá od poslední aktivity)"""
+        return time.time() - self.ttl_seconds
+    
+    @staticmethod
+    def _encode_message(message: Dict[str, str]) -> str:
+        return json.dumps(message, ensure_ascii=False)
+    
+    @staticmethod
+    def _decode_message(record: str) -> Dict[str, str]:
+        message = json.loads(record)
+        # Starší záznamy mohou obsahovat počet tokenů ("tokens") - do historie ani do API nepatří
+        message.pop("tokens", None)
+        return message
+    
+    async def append_messages(self, session_id: str, messages: List[Dict[str, str]]) -> bool:
         """
-        Uloží session do Redis
+        Připojí nové zprávy na konec historie session (RPUSH) a aktualizuje metadata
+        Cena zápisu nezávisí na délce konverzace
         
         Args:
             session_id: ID session
-            history: Historie zpráv
+            messages: Nové zprávy (typicky dotaz uživatele a odpověď agenta)
             
         Returns:
             True pokud se podařilo uložit, False jinak
         """
-        if not self._connected or not self.redis_client:
+        if not messages:
+            return True
+        if not await self._ensure_connected():
             return False
             
         try:
-            key = self._get_key(session_id)
-            data = {
-                "history": history,
-                "updated_at": datetime.now().isoformat(),
-                "session_id": session_id
-            }
+            history_key = self._history_key(session_id)
+            meta_key = self._meta_key(session_id)
+            
+            records = [self._encode_message(msg) for msg in messages]
+            async with self.redis_client.pipeline(transaction=True) as pipe:
+                pipe.rpush(history_key, *records)
+                pipe.hset(meta_key, mapping={
+                    "session_id": session_id,
+                    "updated_at": datetime.now().isoformat()
+                })
+                pipe.hincrby(meta_key, "message_count", len(messages))
+                pipe.hincrby(meta_key, "version", 1)
+                pipe.expire(history_key, self.ttl_seconds)
+                pipe.expire(meta_key, self.ttl_seconds)
+                pipe.zadd(SESSION_INDEX_KEY, {session_id: time.time()})
+                results = await pipe.execute()
             
-            # Uložit jako JSON s TTL
-            self.redis_client.setex(
-                key,
-                self.ttl_seconds,
-                json.dumps(data, ensure_ascii=False)
-            )
+            message_count, version = results[2], results[3]
+            size = sum(self._record_size(record) for record in records)
+            cached = self.local_cache.peek(session_id)
+            if cached is not None and cached["version"] == version - 1:
+                # Zprávy se připojí k lokální kopii na místě - cena nezávisí na délce historie
+                self.local_cache.append(session_id, list(messages), size=size, version=version)
+            elif message_count == len(messages):
+                # Nová session - celá historie jsou právě zapsané zprávy
+                self.local_cache.put(session_id, {"history": list(messages), "version": version}, size=size)
+            else:
+                # Mezitím zapisoval jiný worker, lokální kopie už neplatí
+                self.local_cache.pop(session_id)
             return True
         except Exception as e:
+            self._handle_error(e)
             logger.error(f"❌ Chyba při ukládání session {session_id}: {e}")
             return False
     
-    def load_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+    async def save_summary(self, session_id: str, summary: str, summary_upto: int) -> bool:
         """
-        Načte session z Redis
+        Uloží shrnutí starší části konverzace do metadat session
         
         Args:
             session_id: ID session
+            summary: Text shrnutí
+            summary_upto: Index první zprávy historie, která ve shrnutí není
             
         Returns:
-            Dictionary s "history" nebo None pokud neexistuje
+            True pokud se podařilo uložit
         """
-        if not self._connected or not self.redis_client:
-            return None
+        if not await self._ensure_connected():
+            return False
+        
+        try:
+            await self.redis_client.hset(self._meta_key(session_id), mapping={
+                "summary": summary,
+                "summary_upto": summary_upto
+            })
+            return True
+        except Exception as e:
+            self._handle_error(e)
+            logger.error(f"❌ Chyba při ukládání shrnutí session {session_id}: {e}")
+            return False
+    
+    async def save_session(self, session_id: str, history: List[Dict[str, str]]) -> bool:
+        """
+        Přepíše celou historii session (pro běžné tahy použij append_messages)
+        
+        Args:
+            session_id: ID session
+            history: Historie zpráv
+            
+        Returns:
+            True pokud se podařilo uložit, False jinak
+        """
+        if not await self._ensure_connected():
+            return False
             
         try:
-            key = self._get_key(session_id)
-            data = self.redis_client.get(key)
+            async with self.redis_client.pipeline(transaction=True) as pipe:
+                self._queue_full_write(pipe, session_id, history, datetime.now().isoformat(), self.ttl_seconds)
+                pipe.zadd(SESSION_INDEX_KEY, {session_id: time.time()})
+                pipe.hincrby(self._meta_key(session_id), "version", 1)
+                results = await pipe.execute()
+            self.local_cache.put(session_id, {"history": list(history), "version": results[-1]})
+            return True
+        except Exception as e:
+            self._handle_error(e)
+            logger.error(f"❌ Chyba při ukládání session {session_id}: {e}")
+            return False
+    
+    def _queue_full_write(self, pipe, session_id: str, history: List[Dict[str, str]], updated_at: str, ttl: int):
+        """Přidá do pipeline příkazy pro kompletní zápis historie a metadat"""
+        history_key = self._history_key(session_id)
+        meta_key = self._meta_key(session_id)
+        pipe.delete(history_key)
+        if history:
+            pipe.rpush(history_key, *[self._encode_message(msg) for msg in history])
+            pipe.expire(history_key, ttl)
+        # Přepsaná historie už neodpovídá shrnutí
+        pipe.hdel(meta_key, "summary", "summary_upto")
+        pipe.hset(meta_key, mapping={
+            "session_id": session_id,
+            "updated_at": updated_at,
+            "message_count": len(history)
+        })
+        pipe.expire(meta_key, ttl)
+    
+    def _queue_touch(self, pipe, session_id: str):
+        """Přidá do pipeline čtení verze a shrnutí a prodloužení TTL (session je aktivní)"""
+        meta_key = self._meta_key(session_id)
+        pipe.hmget(meta_key, "version", "summary", "summary_upto")
+        pipe.expire(self._history_key(session_id), self.ttl_seconds)
+        pipe.expire(meta_key, self.ttl_seconds)
+        # XX - jen aktualizace existujícího záznamu, neexistující session se do indexu nepřidá
+        pipe.zadd(SESSION_INDEX_KEY, {session_id: time.time()}, xx=True)
+    
+    def _queue_load(self, pipe, session_id: str, last_n: Optional[int]):
+        """Přidá do pipeline načtení historie, verze a prodloužení TTL"""
+        pipe.lrange(self._history_key(session_id), -last_n if last_n else 0, -1)
+        self._queue_touch(pipe, session_id)
+    
+    @staticmethod
+    def _with_summary(session: Dict[str, Any], meta: list) -> Dict[str, Any]:
+        """Doplní do session shrnutí starší části konverzace (z metadat)"""
+        _, summary, summary_upto = meta
+        if summary:
+            session["summary"] = summary
+            session["summary_upto"] = int(summary_upto or 0)
+        return session
+    
+    @staticmethod
+    def _record_size(record: str) -> int:
+        """Velikost zakódované zprávy v bajtech (jako SessionCache.message_size)"""
+        return len(record.encode("utf-8"))
+    
+    def _parse_load(self, records: list, meta: list) -> Optional[Dict[str, Any]]:
+        if not records:
+            return None
+        return self._with_summary({"history": [self._decode_message(record) for record in records]}, meta)
+    
+    @staticmethod
+    def _from_cache(cached: Dict[str, Any], last_n: Optional[int]) -> Dict[str, Any]:
+        """Vrátí kopii historie z cache (volající ji smí upravovat)"""
+        history = cached["history"][-last_n:] if last_n else cached["history"]
+        return {"history": list(history)}
+    
+    async def load_session(self, session_id: str, last_n: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        Načte session a prodlouží její TTL (jeden round-trip přes pipeline)
+        Pokud má worker v lokální cache stejnou verzi jako Redis, historie se znovu nestahuje ani nedekóduje
+        
+        Args:
+            session_id: ID session
+            last_n: Pokud je zadáno, načte jen posledních N zpráv (LRANGE -N -1)
             
-            if data is None:
-                return None
-                
-            session_data = json.loads(data)
+        Returns:
+            Dictionary s "history" nebo None pokud neexistuje
+        """
+        if not await self._ensure_connected():
+            return None
             
-            # Prodloužit TTL (session je aktivní)
-            self.redis_client.expire(key, self.ttl_seconds)
+        try:
+            cached = self.local_cache.get(session_id)
+            if cached is not None:
+                async with self.redis_client.pipeline(transaction=False) as pipe:
+                    self._queue_touch(pipe, session_id)
+                    results = await pipe.execute()
+                version = results[0][0]
+                if version is not None and int(version) == cached["version"]:
+                    self.cache_hits += 1
+                    return self._with_summary(self._from_cache(cached, last_n), results[0])
+                # Jiný worker zapsal novější verzi (nebo session zmizela)
+                self.cache_stale += 1
+                self.local_cache.pop(session_id)
+            self.cache_misses += 1
             
-            return {"history": session_data.get("history", [])}
+            async with self.redis_client.pipeline(transaction=True) as pipe:
+                self._queue_load(pipe, session_id, last_n)
+                results = await pipe.execute()
+            session = self._parse_load(results[0], results[1])
+            version = results[1][0]
+            # Do cache jen kompletní historie se známou verzí
+            if session is not None and version is not None and not last_n:
+                size = sum(self._record_size(record) for record in results[0])
+                self.local_cache.put(session_id, {"history": session["history"], "version": int(version)}, size=size)
+                session = self._with_summary(self._from_cache(session, None), results[1])
+            return session
         except Exception as e:
+            self._handle_error(e)
             logger.error(f"❌ Chyba při načítání session {session_id}: {e}")
             return None
     
-    def delete_session(self, session_id: str) -> bool:
+    async def load_sessions(self, session_ids: List[str], last_n: Optional[int] = None) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Načte více sessions najednou (jeden round-trip přes pipeline)
+        
+        Args:
+            session_ids: Seznam ID sessions
+            last_n: Pokud je zadáno, načte jen posledních N zpráv každé session
+            
+        Returns:
+            Dictionary session_id -> session (nebo None pokud neexistuje)
+        """
+        if not session_ids or not await self._ensure_connected():
+            return {session_id: None for session_id in session_ids}
+        
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for session_id in session_ids:
+                    self._queue_load(pipe, session_id, last_n)
+                results = await pipe.execute()
+            return {
+                session_id: self._parse_load(results[i * LOAD_PIPELINE_COMMANDS], results[i * LOAD_PIPELINE_COMMANDS + 1])
+                for i, session_id in enumerate(session_ids)
+            }
+        except Exception as e:
+            self._handle_error(e)
+            logger.error(f"❌ Chyba při hromadném načítání sessions: {e}")
+            return {session_id: None for session_id in session_ids}
+    
+    async def delete_session(self, session_id: str) -> bool:
         """
         Smaže session z Redis
         
@@ -131,87 +403,265 @@ class SessionManager:
         Returns:
             True pokud se podařilo smazat
         """
-        if not self._connected or not self.redis_client:
+        if not await self._ensure_connected():
             return False
             
         try:
-            key = self._get_key(session_id)
-            self.redis_client.delete(key)
+            # Data i záznam v indexu se smažou atomicky - index nesmí odkazovat na smazanou session
+            async with self.redis_client.pipeline(transaction=True) as pipe:
+                pipe.delete(
+                    self._history_key(session_id),
+                    self._meta_key(session_id),
+                    self._get_key(session_id)
+                )
+                pipe.zrem(SESSION_INDEX_KEY, session_id)
+                await pipe.execute()
+            self.local_cache.pop(session_id)
             logger.info(f"🗑️  Session {session_id} smazána")
             return True
         except Exception as e:
+            self._handle_error(e)
             logger.error(f"❌ Chyba při mazání session {session_id}: {e}")
             return False
     
-    def list_sessions(self) -> List[str]:
+    @staticmethod
+    def _encode_cursor(score: float, session_id: str) -> str:
+        return f"{score!r}:{session_id}"
+    
+    @staticmethod
+    def _decode_cursor(cursor: str):
+        score, _, session_id = cursor.partition(":")
+        return float(score), session_id
+    
+    async def list_sessions(self, limit: int = 50, cursor: Optional[str] = None) -> Dict[str, Any]:
         """
-        Vrátí seznam všech aktivních session IDs
+        Vrátí stránku aktivních sessions seřazených od poslední aktivity (z indexu, bez KEYS)
         
+        Args:
+            limit: Maximální počet sessions na stránce
+            cursor: Kurzor z předchozí stránky (next_cursor), None = první stránka
+            
         Returns:
-            Seznam session IDs
-        """
-        if not self._connected or not self.redis_client:
-            return []
+            Dictionary se "sessions" (seznam IDs), "next_cursor" (None = poslední stránka) a "total"
             
+        Raises:
+            ValueError: Pokud cursor nemá platný formát
+        """
+        if cursor:
+            score, last_id = self._decode_cursor(cursor)
+        
+        empty = {"sessions": [], "next_cursor": None, "total": 0}
+        if not await self._ensure_connected():
+            return empty
+        
         try:
-            pattern = self._get_key("*")
-            keys = self.redis_client.keys(pattern)
-            # Extrahovat session_id z klíčů
-            session_ids = [key.replace("jarvis:session:", "") for key in keys]
-            return session_ids
+            cutoff = self._expired_before()
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                # Vyřadit z indexu sessions, kterým už vypršelo TTL
+                pipe.zremrangebyscore(SESSION_INDEX_KEY, "-inf", f"({cutoff}")
+                if cursor:
+                    # Sessions se stejným skóre jako poslední vrácená (ZREVRANGE je řadí sestupně podle ID)
+                    pipe.zrevrangebyscore(SESSION_INDEX_KEY, score, score, withscores=True)
+                    pipe.zrevrangebyscore(SESSION_INDEX_KEY, f"({score}", cutoff, start=0, num=limit + 1, withscores=True)
+                else:
+                    pipe.zrevrangebyscore(SESSION_INDEX_KEY, "+inf", cutoff, start=0, num=limit + 1, withscores=True)
+                pipe.zcard(SESSION_INDEX_KEY)
+                results = await pipe.execute()
+            
+            if cursor:
+                ties = [(member, member_score) for member, member_score in results[1] if member < last_id]
+                entries = ties + results[2]
+            else:
+                entries = results[1]
+            
+            page = entries[:limit]
+            next_cursor = self._encode_cursor(page[-1][1], page[-1][0]) if len(entries) > limit else None
+            return {
+                "sessions": [session_id for session_id, _ in page],
+                "next_cursor": next_cursor,
+                "total": results[-1]
+            }
         except Exception as e:
+            self._handle_error(e)
             logger.error(f"❌ Chyba při listování sessions: {e}")
-            return []
+            return empty
     
-    def get_session_info(self, session_id: str) -> Optional[Dict[str, Any]]:
+    @staticmethod
+    def _parse_info(session_id: str, meta: Dict[str, str], ttl: int) -> Optional[Dict[str, Any]]:
+        if not meta:
+            return None
+        return {
+            "session_id": session_id,
+            "message_count": int(meta.get("message_count", 0)),
+            "updated_at": meta.get("updated_at"),
+            "expires_in_seconds": ttl if ttl > 0 else None
+        }
+    
+    async def get_session_info(self, session_id: str) -> Optional[Dict[str, Any]]:
         """
-        Získá informace o session (bez celé historie)
+        Získá informace o session (bez celé historie) z hashe s metadaty
         
         Returns:
             Dictionary s metadata nebo None
         """
-        if not self._connected or not self.redis_client:
+        if not await self._ensure_connected():
             return None
             
         try:
-            key = self._get_key(session_id)
-            data = self.redis_client.get(key)
+            meta_key = self._meta_key(session_id)
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.hgetall(meta_key)
+                pipe.ttl(meta_key)
+                meta, ttl = await pipe.execute()
+            return self._parse_info(session_id, meta, ttl)
+        except Exception as e:
+            self._handle_error(e)
+            logger.error(f"❌ Chyba při získávání info o session {session_id}: {e}")
+            return None
+    
+    async def get_sessions_info(self, session_ids: List[str]) -> List[Dict[str, Any]]:
+        """
+        Získá informace o více sessions najednou (jeden round-trip přes pipeline)
+        
+        Returns:
+            Seznam metadat ve stejném pořadí jako session_ids (neexistující sessions se vynechají)
+        """
+        if not session_ids or not await self._ensure_connected():
+            return []
+        
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for session_id in session_ids:
+                    meta_key = self._meta_key(session_id)
+                    pipe.hgetall(meta_key)
+                    pipe.ttl(meta_key)
+                results = await pipe.execute()
+            infos = [
+                self._parse_info(session_id, results[2 * i], results[2 * i + 1])
+                for i, session_id in enumerate(session_ids)
+            ]
+            return [info for info in infos if info is not None]
+        except Exception as e:
+            self._handle_error(e)
+            logger.error(f"❌ Chyba při hromadném získávání info o sessions: {e}")
+            return []
+    
+    async def migrate_legacy_sessions(self) -> int:
+        """
+        Jednorázová migrace sessions z původního formátu (celý JSON v klíči jarvis:session:*)
+        do append-only formátu (list s historií + hash s metadaty)
+        Zbylé TTL se zachová, původní klíč se smaže.
+        
+        Returns:
+            Počet migrovaných sessions
+        """
+        if not await self._ensure_connected():
+            return 0
+        
+        migrated = 0
+        try:
+            if await self.redis_client.get(MIGRATION_MARKER_KEY):
+                return 0
             
-            if data is None:
-                return None
+            prefix = self._get_key("")
+            async for key in self.redis_client.scan_iter(match=prefix + "*", count=200):
+                if await self.redis_client.type(key) != "string":
+                    continue
+                data = await self.redis_client.get(key)
+                if data is None:
+                    continue
+                try:
+                    session_data = json.loads(data)
+                except json.JSONDecodeError:
+                    logger.warning(f"⚠️  Session {key} má neplatný JSON, přeskakuji")
+                    continue
                 
-            session_data = json.loads(data)
-            ttl = self.redis_client.ttl(key)
+                session_id = key[len(prefix):]
+                ttl = await self.redis_client.ttl(key)
+                async with self.redis_client.pipeline(transaction=True) as pipe:
+                    self._queue_full_write(
+                        pipe,
+                        session_id,
+                        session_data.get("history", []),
+                        session_data.get("updated_at") or datetime.now().isoformat(),
+                        ttl if ttl > 0 else self.ttl_seconds
+                    )
+                    # Skóre v indexu odvodit ze zbývajícího TTL, aby session vypršela z indexu současně s daty
+                    last_activity = time.time() - self.ttl_seconds + (ttl if ttl > 0 else self.ttl_seconds)
+                    pipe.zadd(SESSION_INDEX_KEY, {session_id: last_activity})
+                    pipe.delete(key)
+                    await pipe.execute()
+                migrated += 1
             
-            return {
-                "session_id": session_id,
-                "message_count": len(session_data.get("history", [])),
-                "updated_at": session_data.get("updated_at"),
-                "expires_in_seconds": ttl if ttl > 0 else None
-            }
+            await self.redis_client.set(MIGRATION_MARKER_KEY, datetime.now().isoformat())
+            if migrated:
+                logger.info(f"🔀 Migrováno {migrated} sessions do append-only formátu")
         except Exception as e:
-            logger.error(f"❌ Chyba při získávání info o session {session_id}: {e}")
+            self._handle_error(e)
+            logger.error(f"❌ Chyba při migraci sessions: {e}")
+        return migrated
+    
+    async def lock(self, session_id: str, timeout: float, blocking_timeout: float):
+        """
+        Vrátí distribuovaný zámek session (redis.asyncio Lock) nebo None, když Redis není dostupný
+        
+        Args:
+            session_id: ID session
+            timeout: Po kolika sekundách zámek sám vyprší
+            blocking_timeout: Jak dlouho acquire() čeká na uvolnění
+        """
+        if not await self._ensure_connected():
             return None
+        return self.redis_client.lock(
+            f"jarvis:lock:session:{session_id}",
+            timeout=timeout,
+            blocking_timeout=blocking_timeout
+        )
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """Vrátí statistiky lokální read-through cache pro /health"""
+        cache = self.local_cache.stats()
+        total = self.cache_hits + self.cache_misses
+        return {
+            "entries": cache["entries"],
+            "bytes": cache["bytes"],
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "stale": self.cache_stale,
+            "hit_ratio": round(self.cache_hits / total, 3) if total else None,
+            "evictions": cache["evictions"] + cache["expirations"]
+        }
     
-    def cleanup_expired(self) -> int:
+    async def cleanup_expired(self) -> int:
         """
         Vymaže expirované sessions (Redis to dělá automaticky, toto je pro manuální cleanup)
         
         Returns:
             Počet smazaných sessions
         """
-        # Redis má automatický TTL, takže tento cleanup není nutný
-        # Ponecháno pro kompatibilitu
-        logger.info("ℹ️  Redis automaticky maže expirované sessions (TTL)")
-        return 0
+        # Data maže Redis automaticky (TTL), z indexu je potřeba vyřadit jen jejich ID
+        if not await self._ensure_connected():
+            return 0
+        
+        try:
+            removed = await self.redis_client.zremrangebyscore(SESSION_INDEX_KEY, "-inf", f"({self._expired_before()}")
+            if removed:
+                logger.info(f"🧹 Z indexu vyřazeno {removed} expirovaných sessions")
+            return removed
+        except Exception as e:
+            self._handle_error(e)
+            logger.error(f"❌ Chyba při čištění indexu sessions: {e}")
+            return 0
 
 # Singleton instance
 _session_manager: Optional[SessionManager] = None
 
 def get_session_manager() -> SessionManager:
-    """Získá singleton instanci SessionManageru"""
+    """
+    Získá singleton instanci SessionManageru
+    Připojení k Redis proběhne při startu aplikace (await connect()) nebo líně při první operaci
+    """
     global _session_manager
     if _session_manager is None:
         _session_manager = SessionManager()
-        _session_manager.connect()
     return _session_manager
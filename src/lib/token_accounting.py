@@ -0,0 +1,102 @@
+"""
+Token Accounting pro JARVIS
+Počítání tokenů (tiktoken, s fallbackem na odhad podle délky) a skládání promptu do tokenového rozpočtu
+"""
+
+import json
+import logging
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - tiktoken je v requirements, fallback jen pro jistotu
+    tiktoken = None
+
+# Claude nemá veřejný tokenizer - cl100k_base je rozumná aproximace
+TOKEN_ENCODING = "cl100k_base"
+
+_encoder = None
+_encoder_loaded = False
+
+
+def _get_encoder():
+    """Líně načte tiktoken encoder (při chybě se použije odhad podle délky textu)"""
+    global _encoder, _encoder_loaded
+    if not _encoder_loaded:
+        _encoder_loaded = True
+        if tiktoken is not None:
+            try:
+                _encoder = tiktoken.get_encoding(TOKEN_ENCODING)
+            except Exception as e:
+                logger.warning(f"⚠️  Tokenizer {TOKEN_ENCODING} není dostupný, tokeny se budou odhadovat: {e}")
+    return _encoder
+
+
+@lru_cache(maxsize=64)
+def _count_cached(text: str) -> int:
+    return _count(text)
+
+
+def _count(text: str) -> int:
+    encoder = _get_encoder()
+    if encoder is None:
+        return len(text) // 4 + 1
+    return len(encoder.encode(text, disallowed_special=()))
+
+
+def count_tokens(text: Optional[str], cache: bool = False) -> int:
+    """
+    Spočítá tokeny textu
+
+    Args:
+        text: Text
+        cache: True pro texty, které se opakují (systémový prompt, schémata nástrojů)
+    """
+    if not text:
+        return 0
+    return _count_cached(text) if cache else _count(text)
+
+
+# Počty tokenů zpráv historie podle obsahu - zpráva samotná se nemění (jde do Redis i do API)
+@lru_cache(maxsize=4096)
+def _message_count(content: str) -> int:
+    return _count(content)
+
+
+def message_tokens(message: Dict[str, Any]) -> int:
+    """Vrátí počet tokenů zprávy historie - pro stejný obsah se spočítá jen jednou"""
+    content = message.get("content")
+    if not content:
+        return 0
+    return _message_count(content)
+
+
+def tool_tokens(tool) -> int:
+    """Spočítá tokeny schématu LangChain nástroje (název, popis a argumenty)"""
+    schema = json.dumps(
+        {"name": tool.name, "description": tool.description, "parameters": getattr(tool, "args", {})},
+        ensure_ascii=False,
+        sort_keys=True,
+        default=str
+    )
+    return count_tokens(schema, cache=True)
+
+
+def trim_to_budget(history: List[Dict[str, Any]], budget: int) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Ořízne historii zepředu (po celých tazích dotaz + odpověď), aby se vešla do rozpočtu
+    Poslední tah se ponechá vždy
+
+    Returns:
+        (ponechané zprávy, počet vynechaných zpráv)
+    """
+    total = sum(message_tokens(msg) for msg in history)
+    start = 0
+    while total > budget and len(history) - start > 2:
+        step = 2 if history[start]["role"] == "user" else 1
+        total -= sum(message_tokens(msg) for msg in history[start:start + step])
+        start += step
+    return history[start:], start
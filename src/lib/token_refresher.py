@@ -0,0 +1,114 @@
+"""
+Token Refresher pro JARVIS
+Na pozadí obnovuje OAuth tokeny (Notion, TickTick) s předstihem před jejich expirací,
+aby žádný dotaz nenarazil na vypršelý token a nemusel čekat na obnovu
+"""
+
+import asyncio
+import logging
+import os
+import sys
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "notion-mcp"))
+sys.path.insert(0, str(Path(__file__).parent.parent / "ticktick-mcp"))
+from notion_client import get_notion_client
+from ticktick_client import TOKEN_PATH as TICKTICK_TOKEN_PATH, TickTickClient
+
+logger = logging.getLogger(__name__)
+
+# Jak často kontrolovat expiraci a s jakým předstihem tokeny obnovit (sekundy)
+TOKEN_REFRESH_INTERVAL = float(os.getenv("TOKEN_REFRESH_INTERVAL", "60"))
+NOTION_REFRESH_MARGIN = float(os.getenv("NOTION_REFRESH_MARGIN", "600"))
+TICKTICK_REFRESH_MARGIN = float(os.getenv("TICKTICK_REFRESH_MARGIN", "86400"))
+
+
+class TokenRefresher:
+    """
+    Pravidelně kontroluje expiraci tokenů a obnovuje je
+    Běží v každém workeru - obnovu provede jen jeden (zámek v token_store), ostatní si nový token načtou ze souboru
+    """
+
+    def __init__(
+        self,
+        on_notion_token_changed: Callable[[], Awaitable[None]],
+        interval: float = TOKEN_REFRESH_INTERVAL,
+        notion_margin: float = NOTION_REFRESH_MARGIN,
+        ticktick_margin: float = TICKTICK_REFRESH_MARGIN
+    ):
+        """
+        Inicializace refresheru
+
+        Args:
+            on_notion_token_changed: Zavolá se při změně Notion tokenu (přepojení Notion MCP s novou hlavičkou)
+            interval: Perioda kontroly v sekundách
+            notion_margin: Kolik sekund před expirací obnovit Notion token
+            ticktick_margin: Kolik sekund před expirací obnovit TickTick token
+        """
+        self.on_notion_token_changed = on_notion_token_changed
+        self.interval = interval
+        self.notion_margin = notion_margin
+        self.ticktick_margin = ticktick_margin
+        self._notion_token: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Spustí obnovu tokenů na pozadí (opakované volání nic nedělá)"""
+        if self._task is None or self._task.done():
+            self._notion_token = get_notion_client().access_token
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await self.refresh_all()
+            await asyncio.sleep(self.interval)
+
+    async def refresh_all(self):
+        """Zkontroluje a případně obnoví všechny tokeny - chyba jednoho neovlivní ostatní"""
+        try:
+            await self.refresh_notion()
+        except Exception as e:
+            logger.error(f"❌ Obnova Notion tokenu selhala: {e}")
+        try:
+            await asyncio.to_thread(self._refresh_ticktick)
+        except Exception as e:
+            logger.error(f"❌ Obnova TickTick tokenu selhala: {e}")
+
+    async def refresh_notion(self):
+        """Obnoví Notion token před expirací; při změně tokenu (i obnoveného jiným workerem) přepojí Notion MCP"""
+        notion = get_notion_client()
+
+        def refresh():
+            notion.reload_if_changed()
+            notion.refresh_if_expiring(self.notion_margin)
+
+        await asyncio.to_thread(refresh)
+        if notion.access_token and notion.access_token != self._notion_token:
+            logger.info("🔑 Notion access token se změnil, přepojuji Notion MCP")
+            await self.on_notion_token_changed()
+        self._notion_token = notion.access_token
+
+    def _refresh_ticktick(self):
+        """
+        Obnoví TickTick token před expirací (blokující, zámek obnovy si bere klient)
+        TickTick MCP server si nový token načte ze souboru při dalším požadavku
+        """
+        if not TICKTICK_TOKEN_PATH.exists():
+            return
+        try:
+            client = TickTickClient()
+        except RuntimeError:
+            # Bez přihlášení není co obnovovat
+            return
+        if client.refresh_if_expiring(self.ticktick_margin):
+            logger.info("✅ TickTick token obnoven na pozadí")
@@ -0,0 +1,77 @@
+"""
+Token Store pro JARVIS
+Atomický zápis souborů s OAuth tokeny a zámek obnovy tokenů sdílený mezi procesy (workery)
+"""
+
+import asyncio
+import json
+import logging
+import os
+import tempfile
+from contextlib import asynccontextmanager, contextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterator, Union
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows (vývoj) běží s jedním workerem, zámek není potřeba
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+def write_tokens(path: Union[str, Path], tokens: Dict[str, Any]):
+    """
+    Zapíše tokeny atomicky - nejdřív do dočasného souboru ve stejné složce, pak os.replace
+    Souběžný čtenář (MCP server, jiný worker) tak nikdy neuvidí napůl zapsaný soubor
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(tokens, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+@contextmanager
+def refresh_lock(path: Union[str, Path]) -> Iterator[None]:
+    """
+    Zámek obnovy tokenu napříč procesy - refresh token smí naráz použít jen jeden worker
+    (blokující, volat přes asyncio.to_thread)
+    """
+    path = Path(path)
+    if fcntl is None:
+        yield
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path.with_name(f".{path.name}.lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+@asynccontextmanager
+async def async_refresh_lock(path: Union[str, Path]) -> AsyncIterator[None]:
+    """Varianta refresh_lock pro event loop - na zámek se čeká ve vlákně, loop se neblokuje"""
+    path = Path(path)
+    if fcntl is None:
+        yield
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path.with_name(f".{path.name}.lock"), "w") as lock_file:
+        await asyncio.to_thread(fcntl.flock, lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -0,0 +1,234 @@
+"""
+Tool Catalog pro JARVIS
+Cache LangChain nástrojů ze všech MCP serverů, klíčovaná názvem serveru a otiskem (hash) schémat nástrojů
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from mcp.types import CancelledNotification, CancelledNotificationParams, ClientNotification
+from mcp_use import MCPAgent
+from mcp_use.adapters import LangChainAdapter
+
+from token_accounting import tool_tokens
+
+logger = logging.getLogger(__name__)
+
+# Rozeslané notifikace o zrušení (reference, aby je garbage collector nezrušil před odesláním)
+_cancel_notifications: set = set()
+
+
+def propagate_cancellation(connector):
+    """
+    Při zrušení běhu agenta pošle MCP serveru notifications/cancelled pro rozpracovaný požadavek,
+    aby server přestal provádět volání nástroje, na jehož výsledek už nikdo nečeká
+    """
+    client_session = connector.client_session
+    if client_session is None or getattr(client_session, "_cancel_propagation", False):
+        return
+    send_request = client_session.send_request
+
+    async def send_request_with_cancel(request, *args, **kwargs):
+        # ID, které send_request přidělí (přiděluje se synchronně hned na začátku)
+        request_id = client_session._request_id
+        try:
+            return await send_request(request, *args, **kwargs)
+        except asyncio.CancelledError:
+            notification = ClientNotification(CancelledNotification(
+                params=CancelledNotificationParams(requestId=request_id, reason="Dotaz byl zrušen klientem")
+            ))
+            task = asyncio.ensure_future(client_session.send_notification(notification))
+            _cancel_notifications.add(task)
+            task.add_done_callback(_cancel_notifications.discard)
+            raise
+
+    client_session.send_request = send_request_with_cancel
+    client_session._cancel_propagation = True
+
+
+class ToolCatalog:
+    """Cache katalogu nástrojů - nástroje se znovu vytváří jen když se změní schéma serveru"""
+
+    def __init__(self):
+        self._adapter = LangChainAdapter()
+        # server_name -> {"schema_hash", "tools", "tool_names", "tokens", "connector", "refreshed_at"}
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self.refresh_count = 0
+        self.rebuild_count = 0
+        self.refreshed_at: Optional[float] = None
+        self._stale = False
+
+    @staticmethod
+    def _schema_hash(mcp_tools: list) -> str:
+        """Spočítá otisk schémat nástrojů serveru (nezávislý na pořadí)"""
+        schemas = sorted(
+            (
+                {
+                    "name": tool.name,
+                    "description": tool.description or "",
+                    "input_schema": tool.inputSchema or {}
+                }
+                for tool in mcp_tools
+            ),
+            key=lambda schema: schema["name"]
+        )
+        payload = json.dumps(schemas, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def _convert_extras(self, connector) -> list:
+        """Převede resources a prompty serveru na nástroje (stejně jako MCPAgent)"""
+        extras = []
+        try:
+            for resource in await connector.list_resources() or []:
+                converted = self._adapter._convert_resource(resource, connector)
+                if converted:
+                    extras.append(converted)
+            for prompt in await connector.list_prompts() or []:
+                converted = self._adapter._convert_prompt(prompt, connector)
+                if converted:
+                    extras.append(converted)
+        except Exception as e:
+            logger.warning(f"⚠️  Nelze načíst resources/prompty: {e}")
+        return extras
+
+    async def refresh_server(self, server_name: str, session) -> bool:
+        """
+        Obnoví záznam jednoho serveru v katalogu
+
+        Args:
+            server_name: Název MCP serveru
+            session: Aktivní MCPSession serveru
+
+        Returns:
+            True pokud se nástroje serveru znovu vytvořily (změnilo se schéma nebo připojení)
+        """
+        connector = session.connector
+        mcp_tools = await connector.list_tools()
+        schema_hash = self._schema_hash(mcp_tools)
+
+        self.refreshed_at = time.time()
+        entry = self._entries.get(server_name)
+        if entry and entry["schema_hash"] == schema_hash and entry["connector"] is connector:
+            entry["refreshed_at"] = self.refreshed_at
+            return False
+
+        propagate_cancellation(connector)
+        tools = []
+        for mcp_tool in mcp_tools:
+            converted = self._adapter._convert_tool(mcp_tool, connector)
+            if converted:
+                tools.append(converted)
+        tools.extend(await self._convert_extras(connector))
+
+        self._entries[server_name] = {
+            "schema_hash": schema_hash,
+            "tools": tools,
+            "tool_names": [tool.name for tool in tools],
+            # Tokeny schémat se spočítají jen při přestavbě, ne při každém dotazu
+            "tokens": sum(tool_tokens(tool) for tool in tools),
+            "connector": connector,
+            "refreshed_at": time.time()
+        }
+        self.rebuild_count += 1
+        logger.info(f"🔧 Server '{server_name}': {len(tools)} nástrojů - {[tool.name for tool in tools]}")
+        return True
+
+    async def refresh(self, client) -> bool:
+        """
+        Obnoví katalog pro všechny aktivní sessions klienta (servery se dotazují paralelně)
+
+        Returns:
+            True pokud se změnil alespoň jeden server
+        """
+        active_sessions = client.get_all_active_sessions()
+
+        async def refresh_one(server_name: str, session) -> bool:
+            try:
+                if not session.is_connected:
+                    logger.warning(f"⚠️  Server '{server_name}': není připojen")
+                    return False
+                return await self.refresh_server(server_name, session)
+            except Exception as e:
+                logger.warning(f"⚠️  Server '{server_name}': chyba při získávání nástrojů - {e}")
+                return False
+
+        results = await asyncio.gather(
+            *(refresh_one(server_name, session) for server_name, session in active_sessions.items())
+        )
+        changed = any(results)
+
+        # Servery, které už nejsou aktivní, z katalogu vyřadit
+        for server_name in list(self._entries):
+            if server_name not in active_sessions:
+                del self._entries[server_name]
+                changed = True
+
+        self.refresh_count += 1
+        self.refreshed_at = time.time()
+        self._stale = False
+        return changed
+
+    def mark_stale(self):
+        """Označí katalog k obnovení (např. po notifikaci o změně nástrojů)"""
+        self._stale = True
+
+    @property
+    def is_stale(self) -> bool:
+        return self._stale
+
+    def tools(self) -> list:
+        """Vrátí všechny nástroje z katalogu"""
+        return [tool for entry in self._entries.values() for tool in entry["tools"]]
+
+    def tokens(self) -> int:
+        """Vrátí počet tokenů, které v promptu zaberou schémata všech nástrojů"""
+        return sum(entry["tokens"] for entry in self._entries.values())
+
+    def server_for_tool(self, tool_name: str) -> Optional[str]:
+        """Vrátí název serveru, ze kterého nástroj pochází"""
+        for server_name, entry in self._entries.items():
+            if tool_name in entry["tool_names"]:
+                return server_name
+        return None
+
+    def remove_server(self, server_name: str) -> bool:
+        """Vyřadí nástroje serveru z katalogu (server je nedostupný) - True pokud v katalogu byl"""
+        return self._entries.pop(server_name, None) is not None
+
+    def clear(self):
+        """Vyprázdní katalog (při reinicializaci klienta)"""
+        self._entries = {}
+        self.refreshed_at = None
+
+    async def attach_to_agent(self, agent: MCPAgent):
+        """
+        Inicializuje agenta nástroji z katalogu místo agent.initialize()
+        Agent tak nemusí znovu volat list_tools() na všech serverech
+        """
+        agent._tools = self.tools()
+        await agent._create_system_message_from_tools(agent._tools)
+        agent._agent_executor = agent._create_agent()
+        agent._initialized = True
+
+    def stats(self) -> Dict[str, Any]:
+        """Vrátí informace o katalogu pro /health"""
+        now = time.time()
+        return {
+            "age_seconds": round(now - self.refreshed_at, 1) if self.refreshed_at else None,
+            "refresh_count": self.refresh_count,
+            "rebuild_count": self.rebuild_count,
+            "stale": self._stale,
+            "servers": {
+                server_name: {
+                    "tools": len(entry["tools"]),
+                    "tokens": entry["tokens"],
+                    "schema_hash": entry["schema_hash"][:12],
+                    "age_seconds": round(now - entry["refreshed_at"], 1)
+                }
+                for server_name, entry in self._entries.items()
+            }
+        }
@@ -0,0 +1,269 @@
+"""
+MCP Host pro JARVIS
+Spustí lokální (stdio) MCP servery jednou a zpřístupní je API workerům přes streamable HTTP
+Server je dostupný na /{název serveru}/mcp, stav serverů na /health
+
+Použití:
+    python src/mcp_host.py --port 8765
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+import weakref
+from contextlib import asynccontextmanager
+from functools import partial
+from pathlib import Path
+from typing import Any, Dict
+
+import mcp.types as types
+import uvicorn
+from dotenv import load_dotenv
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from mcp.server.lowlevel import Server
+from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
+from mcp_use import MCPClient
+
+# Přidání src/lib do PYTHONPATH
+sys.path.insert(0, str(Path(__file__).parent / "lib"))
+
+from mcp_config import build_local_servers
+from mcp_supervisor import ServerSupervisor
+from tool_catalog import propagate_cancellation
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+MCP_SERVER_STARTUP_TIMEOUT = float(os.getenv("MCP_SERVER_STARTUP_TIMEOUT", "60"))
+
+# Požadavky, které host přeposílá serveru (typ požadavku -> typ výsledku), podle schopností serveru
+FORWARDED_REQUESTS = {
+    "tools": [
+        (types.ListToolsRequest, types.ListToolsResult),
+        (types.CallToolRequest, types.CallToolResult)
+    ],
+    "resources": [
+        (types.ListResourcesRequest, types.ListResourcesResult),
+        (types.ListResourceTemplatesRequest, types.ListResourceTemplatesResult),
+        (types.ReadResourceRequest, types.ReadResourceResult)
+    ],
+    "prompts": [
+        (types.ListPromptsRequest, types.ListPromptsResult),
+        (types.GetPromptRequest, types.GetPromptResult)
+    ]
+}
+
+
+class McpHost:
+    """Drží lokální MCP servery a pro každý z nich streamable HTTP endpoint"""
+
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+        self.client = None
+        # server_name -> StreamableHTTPSessionManager (servery, které alespoň jednou nastartovaly)
+        self.managers: Dict[str, StreamableHTTPSessionManager] = {}
+        # server_name -> sessions připojených workerů (pro přeposílání oznámení o změně nástrojů)
+        self._clients: Dict[str, weakref.WeakSet] = {}
+        # Stav a doba prvního startu serverů (exportováno na /health)
+        self.servers: Dict[str, Dict[str, Any]] = {}
+        self._ready: Dict[str, asyncio.Event] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._stopping = asyncio.Event()
+        # Spadlé servery restartuje supervisor - endpoint serveru zůstává stejný
+        self.supervisor = ServerSupervisor(
+            get_client=lambda: self.client,
+            restart_server=self.start_server,
+            is_starting=lambda server_name: self.servers.get(server_name, {}).get("status") == "starting"
+        )
+
+    async def start(self):
+        """Spustí všechny servery paralelně na pozadí - /health mezitím hlásí "starting" """
+        self.client = MCPClient.from_dict(self.config)
+        logger.info(f"🔧 MCP host spouští servery: {self.client.get_server_names()}")
+        for server_name in self.client.get_server_names():
+            self._ready[server_name] = asyncio.Event()
+            self._tasks[server_name] = asyncio.create_task(self._serve(server_name))
+        self.supervisor.start()
+
+    async def stop(self):
+        """Ukončí HTTP endpointy a zavře MCP servery"""
+        await self.supervisor.stop()
+        self._stopping.set()
+        for server_name, task in self._tasks.items():
+            # Servery, které ještě nenastartovaly, nemá smysl dál čekat
+            if server_name not in self.managers:
+                task.cancel()
+        if self._tasks:
+            await asyncio.wait(self._tasks.values(), timeout=10)
+        if self.client:
+            await self.client.close_all_sessions()
+
+    async def start_server(self, server_name: str):
+        """Spustí (nebo restartuje) lokální server; při neúspěchu vyhodí výjimku"""
+        if server_name in self.client.sessions:
+            await self.client.close_session(server_name)
+        session = await asyncio.wait_for(
+            self.client.create_session(server_name),
+            timeout=MCP_SERVER_STARTUP_TIMEOUT
+        )
+        propagate_cancellation(session.connector)
+        # Oznámení serveru se zpracují s jeho názvem (handler klienta je společný pro všechny servery)
+        session.connector.message_handler = partial(self._on_server_message, server_name)
+        restarted = self._ready[server_name].is_set()
+        self._ready[server_name].set()
+        if restarted:
+            # Restartovaný server mohl přijít s jinými nástroji
+            await self._notify_tools_changed(server_name)
+
+    async def _on_server_message(self, server_name: str, message):
+        """Oznámení lokálního serveru o změně nástrojů přepošle připojeným workerům"""
+        if isinstance(message, types.ServerNotification) and isinstance(message.root, types.ToolListChangedNotification):
+            await self._notify_tools_changed(server_name)
+
+    async def _notify_tools_changed(self, server_name: str):
+        """Pošle notifications/tools/list_changed všem workerům připojeným k serveru - obnoví si katalog nástrojů"""
+        clients = self._clients.get(server_name)
+        if not clients:
+            return
+        logger.info(f"🔄 Server '{server_name}' změnil nástroje, oznamuji {len(clients)} připojeným workerům")
+        for client_session in list(clients):
+            try:
+                await client_session.send_tool_list_changed()
+            except Exception as e:
+                # Worker se mezitím odpojil
+                logger.debug(f"Oznámení změny nástrojů se nepodařilo doručit: {e}")
+                clients.discard(client_session)
+
+    async def _first_start(self, server_name: str):
+        started = time.monotonic()
+        self.servers[server_name] = {"status": "starting", "seconds": None}
+        try:
+            await self.start_server(server_name)
+            status = "ready"
+        except asyncio.TimeoutError:
+            status = "timeout"
+        except Exception as e:
+            logger.error(f"❌ Server '{server_name}' se nepodařilo spustit: {e}")
+            status = "failed"
+
+        elapsed = round(time.monotonic() - started, 3)
+        self.servers[server_name] = {"status": status, "seconds": elapsed}
+        if status == "ready":
+            logger.info(f"✅ Server '{server_name}' připraven za {elapsed}s")
+        else:
+            logger.warning(f"⚠️  Server '{server_name}' není připraven ({status}) po {elapsed}s, restartuje ho supervisor")
+
+    async def _serve(self, server_name: str):
+        """Spustí server a po jeho prvním úspěšném startu otevře HTTP endpoint, který drží až do ukončení hostu"""
+        await self._first_start(server_name)
+        # Server, který napoprvé nenastartoval, zkouší dál spouštět supervisor
+        await self._ready[server_name].wait()
+        capabilities = self.client.sessions[server_name].connector.capabilities
+        manager = StreamableHTTPSessionManager(app=self._proxy(server_name, capabilities))
+        # Správce HTTP sessions musí běžet v jediném tasku od startu do ukončení
+        async with manager.run():
+            self.managers[server_name] = manager
+            try:
+                await self._stopping.wait()
+            finally:
+                self.managers.pop(server_name, None)
+
+    def _proxy(self, server_name: str, capabilities) -> Server:
+        """
+        MCP server, který požadavky beze změny přeposílá lokálnímu serveru
+        Zrušení požadavku klientem se přes propagate_cancellation předá až lokálnímu serveru
+        """
+        server = Server(server_name)
+        for capability, requests in FORWARDED_REQUESTS.items():
+            if capabilities is None or getattr(capabilities, capability) is None:
+                continue
+            for request_type, result_type in requests:
+                server.request_handlers[request_type] = self._forward(server, server_name, result_type)
+        return server
+
+    def _forward(self, server: Server, server_name: str, result_type):
+        async def handler(request):
+            # Session workeru si host pamatuje kvůli oznámením o změně nástrojů (zapomene ji po jejím zániku)
+            self._clients.setdefault(server_name, weakref.WeakSet()).add(server.request_context.session)
+            # Session se hledá při každém požadavku - po restartu serveru je nová
+            session = self.client.sessions.get(server_name)
+            if session is None or session.connector.client_session is None:
+                raise RuntimeError(f"MCP server '{server_name}' se restartuje, zkuste to prosím znovu")
+            # Přijatý požadavek nese i pole JSON-RPC obálky (id, jsonrpc) - dál jde jen metoda a parametry
+            forwarded = type(request)(method=request.method, params=request.params)
+            result = await session.connector.client_session.send_request(types.ClientRequest(forwarded), result_type)
+            return types.ServerResult(result)
+        return handler
+
+
+class McpEndpoint:
+    """ASGI endpoint /{server_name}/mcp - předá požadavek streamable HTTP správci daného serveru"""
+
+    def __init__(self, host: McpHost):
+        self.host = host
+
+    async def __call__(self, scope, receive, send):
+        server_name = scope["path_params"]["server_name"]
+        manager = self.host.managers.get(server_name)
+        if manager is None:
+            status = self.host.servers.get(server_name, {}).get("status")
+            response = JSONResponse(
+                {"detail": f"MCP server '{server_name}' není dostupný ({status or 'neznámý'})"},
+                status_code=404 if status is None else 503
+            )
+            await response(scope, receive, send)
+            return
+        await manager.handle_request(scope, receive, send)
+
+
+host = McpHost({
+    "mcpServers": build_local_servers(
+        os.getenv("LINKUP_API_KEY", ""),
+        os.getenv("N8N_API_URL", ""),
+        os.getenv("N8N_API_KEY", "")
+    )
+})
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await host.start()
+    yield
+    await host.stop()
+
+
+app = FastAPI(title="MCP Host", lifespan=lifespan)
+app.router.add_route("/{server_name}/mcp", McpEndpoint(host), include_in_schema=False)
+
+
+@app.get("/health")
+async def health():
+    """Stav lokálních MCP serverů"""
+    return {
+        "status": "ok",
+        "servers": host.servers,
+        "health": host.supervisor.stats()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MCP Host pro JARVIS")
+    parser.add_argument("--host", type=str, default=os.getenv("MCP_HOST_BIND", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("MCP_HOST_PORT", "8765")))
+    parser.add_argument("--log-level", type=str, default=os.getenv("LOG_LEVEL", "info"))
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=getattr(logging, args.log_level.upper()),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level=args.log_level)
+
+
+if __name__ == "__main__":
+    main()
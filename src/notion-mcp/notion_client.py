@@ -11,6 +11,8 @@ import time
 from pathlib import Path
 from typing import Dict, Any, Optional
 
+from token_store import refresh_lock, write_tokens
+
 logger = logging.getLogger(__name__)
 
 # Správná cesta: src/lib/tokens/notion_tokens.json (ne src/notion-mcp/lib/tokens/)
@@ -22,13 +24,14 @@ class NotionClient:
     Načte tokeny z JSON, automaticky obnovuje když expirují.
     """
     def __init__(self):
+        self.expires_at = None  # Timestamp kdy token expiruje
+        self._tokens_mtime = None  # mtime načteného souboru s tokeny
         self._load_tokens()
         # Notion MCP OAuth endpoint
         self.token_url = "https://mcp.notion.com/token"
         # Veřejný MCP client
         self.client_id = "YvWLaE2nKO861jM1"
         self.client_secret = None  # Public client nemá secret
-        self.expires_at = None  # Timestamp kdy token expiruje
 
     def _load_tokens(self):
         """Načti tokeny z JSON souboru"""
@@ -43,6 +46,7 @@ class NotionClient:
             return
         
         try:
+            self._tokens_mtime = TOKEN_PATH.stat().st_mtime
             with open(TOKEN_PATH, "r", encoding="utf-8") as f:
                 data = json.load(f)
             
@@ -97,7 +101,7 @@ class NotionClient:
             token_data["client_id"] = self.client_id
         
         try:
-            response = requests.post(self.token_url, data=token_data, headers=headers)
+            response = requests.post(self.token_url, data=token_data, headers=headers, timeout=30)
             response.raise_for_status()
             
             tokens = response.json()
@@ -111,17 +115,17 @@ class NotionClient:
             expires_in = tokens.get('expires_in', 3600)
             self.expires_at = time.time() + expires_in
             
-            # Ulož nové tokeny zpět do JSON souboru
-            with open(TOKEN_PATH, "w", encoding="utf-8") as f:
-                json.dump({
-                    "access_token": self.access_token,
-                    "refresh_token": self.refresh_token,
-                    "token_type": tokens.get("token_type", "bearer"),
-                    "expires_in": expires_in,
-                    "expires_at": self.expires_at,
-                    "obtained_at": int(time.time()),
-                    "scope": tokens.get("scope", "")
-                }, f, ensure_ascii=False, indent=2)
+            # Ulož nové tokeny zpět do JSON souboru (atomicky - soubor čtou i ostatní workery)
+            write_tokens(TOKEN_PATH, {
+                "access_token": self.access_token,
+                "refresh_token": self.refresh_token,
+                "token_type": tokens.get("token_type", "bearer"),
+                "expires_in": expires_in,
+                "expires_at": self.expires_at,
+                "obtained_at": int(time.time()),
+                "scope": tokens.get("scope", "")
+            })
+            self._tokens_mtime = TOKEN_PATH.stat().st_mtime
             
             logger.info("✓ Notion access token úspěšně obnoven")
             return True
@@ -140,27 +144,54 @@ class NotionClient:
         Returns:
             Access token string nebo None pokud není k dispozici
         """
+        # Token mohl mezitím obnovit jiný worker nebo refresher na pozadí
+        self.reload_if_changed()
         if not self.access_token:
             logger.warning("⚠️  Notion tokeny nejsou k dispozici. Navštiv /api/notion/auth pro autorizaci.")
             return None
         
         # Kontrola expirace - obnovíme token 5 minut před jeho skutečnou expirací
-        if auto_refresh and self.refresh_token and self.expires_at:
-            time_until_expiry = self.expires_at - time.time()
-            
-            # Pokud token vyprší za méně než 5 minut, obnov ho
-            if time_until_expiry < 300:  # 5 minut = 300 sekund
-                logger.info(f"Token brzy expiruje ({int(time_until_expiry)}s), obnovuji...")
-                try:
-                    if self._refresh_access_token():
-                        logger.info("✓ Token automaticky obnoven")
-                    else:
-                        logger.warning("⚠️  Automatické obnovení tokenu selhalo")
-                except Exception as e:
-                    logger.error(f"❌ Chyba při automatickém obnovení tokenu: {e}")
+        # (běžně ho obnoví dřív refresher na pozadí, tohle je pojistka)
+        if auto_refresh:
+            try:
+                if self.refresh_if_expiring(300):  # 5 minut = 300 sekund
+                    logger.info("✓ Token automaticky obnoven")
+            except Exception as e:
+                logger.error(f"❌ Chyba při automatickém obnovení tokenu: {e}")
                 
         return self.access_token
 
+    def reload_if_changed(self) -> bool:
+        """Znovu načte tokeny, pokud soubor mezitím změnil někdo jiný (upload, jiný worker) - True při změně"""
+        try:
+            mtime = TOKEN_PATH.stat().st_mtime
+        except OSError:
+            return False
+        if mtime == self._tokens_mtime:
+            return False
+        self._load_tokens()
+        return True
+
+    def refresh_if_expiring(self, margin_seconds: float) -> bool:
+        """
+        Obnoví token, pokud vyprší dřív než za margin_seconds (blokující - volat mimo event loop)
+        Obnovu provede jen jeden proces, ostatní si nový token načtou ze souboru
+
+        Returns:
+            True pokud se token obnovil
+        """
+        if not self.refresh_token or not self.expires_at:
+            return False
+        if self.expires_at - time.time() >= margin_seconds:
+            return False
+        with refresh_lock(TOKEN_PATH):
+            # Mezitím mohl token obnovit jiný worker
+            self.reload_if_changed()
+            if self.expires_at and self.expires_at - time.time() >= margin_seconds:
+                return False
+            logger.info(f"Notion token vyprší za {int(self.expires_at - time.time())}s, obnovuji na pozadí...")
+            return self._refresh_access_token()
+
     def handle_401(self) -> bool:
         """
         Zavolej když dostaneš 401 chybu.
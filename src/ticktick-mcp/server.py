@@ -6,7 +6,8 @@ from typing import Dict, List, Any, Optional
 
 from mcp.server.fastmcp import FastMCP
 
-from ticktick_client import TickTickClient
+from task_mirror import TaskMirror
+from ticktick_client import AsyncTickTickClient, TickTickClient
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -17,17 +18,16 @@ mcp = FastMCP("ticktick")
 
 # Create TickTick client (používá access token z lib/tokens/ticktick_tokens.json)
 ticktick = None
+# Lokální kopie projektů a úkolů - čtecí nástroje odpovídají z ní, změny ji zneplatňují
+mirror = None
 
 def initialize_client():
-    global ticktick
+    global ticktick, mirror
     try:
-        ticktick = TickTickClient()
+        # Asynchronní klient - souběžná volání nástrojů neblokují event loop serveru
+        ticktick = AsyncTickTickClient()
+        mirror = TaskMirror(ticktick)
         logger.info("TickTick client initialized successfully")
-        projects = ticktick.get_projects()
-        if 'error' in projects:
-            logger.error(f"Failed to access TickTick API: {projects['error']}")
-            return False
-        logger.info(f"Successfully connected to TickTick API with {len(projects)} projects")
         return True
     except RuntimeError as e:
         logger.warning(f"TickTick client not ready: {e}")
@@ -36,6 +36,22 @@ def initialize_client():
         logger.error(f"Failed to initialize TickTick client: {e}")
         return False
 
+def check_connection() -> bool:
+    """Ověří přístup k TickTick API před spuštěním serveru (blokující klient - event loop ještě neběží)"""
+    try:
+        projects = TickTickClient().get_projects()
+    except RuntimeError as e:
+        logger.warning(f"TickTick client not ready: {e}")
+        return False
+    except Exception as e:
+        logger.error(f"Failed to initialize TickTick client: {e}")
+        return False
+    if 'error' in projects:
+        logger.error(f"Failed to access TickTick API: {projects['error']}")
+        return False
+    logger.info(f"Successfully connected to TickTick API with {len(projects)} projects")
+    return True
+
 # Format functions (zůstávají stejné)
 def format_task(task: Dict) -> str:
     formatted = f"ID: {task.get('id', 'No ID')}\n"
@@ -73,14 +89,14 @@ def format_project(project: Dict) -> str:
         formatted += f"Kind: {project.get('kind')}\n"
     return formatted
 
-# MCP Tools (zůstávají stejné, pouze odstraněna závislost na .env a používá se pouze TickTickClient z JSON tokenu)
+# MCP Tools (zůstávají stejné, pouze odstraněna závislost na .env a používá se pouze AsyncTickTickClient z JSON tokenu)
 @mcp.tool()
 async def get_projects() -> str:
     if not ticktick:
         if not initialize_client():
             return "TickTick není připojen. Přihlas se prosím přes UI na https://ai.vojtechfal.cz/ticktick/login"
     try:
-        projects = ticktick.get_projects()
+        projects = await mirror.get_projects()
         if 'error' in projects:
             return f"Error fetching projects: {projects['error']}"
         if not projects:
@@ -106,7 +122,7 @@ async def get_project(project_id: str) -> str:
             return "Failed to initialize TickTick client. Please check your API credentials."
     
     try:
-        project = ticktick.get_project(project_id)
+        project = await ticktick.get_project(project_id)
         if 'error' in project:
             return f"Error fetching project: {project['error']}"
         
@@ -128,7 +144,7 @@ async def get_project_tasks(project_id: str) -> str:
             return "Failed to initialize TickTick client. Please check your API credentials."
     
     try:
-        project_data = ticktick.get_project_with_data(project_id)
+        project_data = await mirror.get_project_data(project_id)
         if 'error' in project_data:
             return f"Error fetching project data: {project_data['error']}"
         
@@ -159,7 +175,7 @@ async def get_task(project_id: str, task_id: str) -> str:
             return "Failed to initialize TickTick client. Please check your API credentials."
     
     try:
-        task = ticktick.get_task(project_id, task_id)
+        task = await mirror.get_task(project_id, task_id)
         if 'error' in task:
             return f"Error fetching task: {task['error']}"
         
@@ -206,7 +222,7 @@ async def create_task(
                 except ValueError:
                     return f"Invalid {date_name} format. Use ISO format: YYYY-MM-DDThh:mm:ss+0000"
         
-        task = ticktick.create_task(
+        task = await mirror.create_task(
             title=title,
             project_id=project_id,
             content=content,
@@ -263,7 +279,7 @@ async def update_task(
                 except ValueError:
                     return f"Invalid {date_name} format. Use ISO format: YYYY-MM-DDThh:mm:ss+0000"
         
-        task = ticktick.update_task(
+        task = await mirror.update_task(
             task_id=task_id,
             project_id=project_id,
             title=title,
@@ -295,7 +311,7 @@ async def complete_task(project_id: str, task_id: str) -> str:
             return "Failed to initialize TickTick client. Please check your API credentials."
     
     try:
-        result = ticktick.complete_task(project_id, task_id)
+        result = await mirror.complete_task(project_id, task_id)
         if 'error' in result:
             return f"Error completing task: {result['error']}"
         
@@ -318,7 +334,7 @@ async def delete_task(project_id: str, task_id: str) -> str:
             return "Failed to initialize TickTick client. Please check your API credentials."
     
     try:
-        result = ticktick.delete_task(project_id, task_id)
+        result = await mirror.delete_task(project_id, task_id)
         if 'error' in result:
             return f"Error deleting task: {result['error']}"
         
@@ -350,7 +366,7 @@ async def create_project(
         return "Invalid view_mode. Must be one of: list, kanban, timeline."
     
     try:
-        project = ticktick.create_project(
+        project = await mirror.create_project(
             name=name,
             color=color,
             view_mode=view_mode
@@ -377,7 +393,7 @@ async def delete_project(project_id: str) -> str:
             return "Failed to initialize TickTick client. Please check your API credentials."
     
     try:
-        result = ticktick.delete_project(project_id)
+        result = await mirror.delete_project(project_id)
         if 'error' in result:
             return f"Error deleting project: {result['error']}"
         
@@ -492,7 +508,7 @@ def _validate_task_data(task_data: Dict[str, Any], task_index: int) -> Optional[
     
     return None
 
-def _get_project_tasks_by_filter(projects: List[Dict], filter_func, filter_name: str) -> str:
+async def _get_project_tasks_by_filter(projects: List[Dict], filter_func, filter_name: str) -> str:
     """
     Helper function to filter tasks across all projects.
     
@@ -509,12 +525,10 @@ def _get_project_tasks_by_filter(projects: List[Dict], filter_func, filter_name:
     
     result = f"Found {len(projects)} projects:\n\n"
     
-    for i, project in enumerate(projects, 1):
-        if project.get('closed'):
-            continue
-            
-        project_id = project.get('id', 'No ID')
-        project_data = ticktick.get_project_with_data(project_id)
+    open_projects = [(i, project) for i, project in enumerate(projects, 1) if not project.get('closed')]
+    projects_data = await mirror.get_projects_data([project.get('id', 'No ID') for _, project in open_projects])
+    
+    for (i, project), project_data in zip(open_projects, projects_data):
         tasks = project_data.get('tasks', [])
         
         if not tasks:
@@ -545,14 +559,14 @@ async def get_all_tasks() -> str:
             return "Failed to initialize TickTick client. Please check your API credentials."
     
     try:
-        projects = ticktick.get_projects()
+        projects = await mirror.get_projects()
         if 'error' in projects:
             return f"Error fetching projects: {projects['error']}"
         
         def all_tasks_filter(task: Dict[str, Any]) -> bool:
             return True  # Include all tasks
         
-        return _get_project_tasks_by_filter(projects, all_tasks_filter, "included")
+        return await _get_project_tasks_by_filter(projects, all_tasks_filter, "included")
         
     except Exception as e:
         logger.error(f"Error in get_all_tasks: {e}")
@@ -574,7 +588,7 @@ async def get_tasks_by_priority(priority_id: int) -> str:
         return f"Invalid priority_id. Valid values: {list(PRIORITY_MAP.keys())}"
     
     try:
-        projects = ticktick.get_projects()
+        projects = await mirror.get_projects()
         if 'error' in projects:
             return f"Error fetching projects: {projects['error']}"
         
@@ -582,7 +596,7 @@ async def get_tasks_by_priority(priority_id: int) -> str:
             return task.get('priority', 0) == priority_id
         
         priority_name = f"{PRIORITY_MAP[priority_id]} ({priority_id})"
-        return _get_project_tasks_by_filter(projects, priority_filter, f"priority '{priority_name}'")
+        return await _get_project_tasks_by_filter(projects, priority_filter, f"priority '{priority_name}'")
         
     except Exception as e:
         logger.error(f"Error in get_tasks_by_priority: {e}")
@@ -596,14 +610,14 @@ async def get_tasks_due_today() -> str:
             return "Failed to initialize TickTick client. Please check your API credentials."
     
     try:
-        projects = ticktick.get_projects()
+        projects = await mirror.get_projects()
         if 'error' in projects:
             return f"Error fetching projects: {projects['error']}"
         
         def today_filter(task: Dict[str, Any]) -> bool:
             return _is_task_due_today(task)
         
-        return _get_project_tasks_by_filter(projects, today_filter, "due today")
+        return await _get_project_tasks_by_filter(projects, today_filter, "due today")
         
     except Exception as e:
         logger.error(f"Error in get_tasks_due_today: {e}")
@@ -617,14 +631,14 @@ async def get_overdue_tasks() -> str:
             return "Failed to initialize TickTick client. Please check your API credentials."
     
     try:
-        projects = ticktick.get_projects()
+        projects = await mirror.get_projects()
         if 'error' in projects:
             return f"Error fetching projects: {projects['error']}"
         
         def overdue_filter(task: Dict[str, Any]) -> bool:
             return _is_task_overdue(task)
         
-        return _get_project_tasks_by_filter(projects, overdue_filter, "overdue")
+        return await _get_project_tasks_by_filter(projects, overdue_filter, "overdue")
         
     except Exception as e:
         logger.error(f"Error in get_overdue_tasks: {e}")
@@ -638,14 +652,14 @@ async def get_tasks_due_tomorrow() -> str:
             return "Failed to initialize TickTick client. Please check your API credentials."
     
     try:
-        projects = ticktick.get_projects()
+        projects = await mirror.get_projects()
         if 'error' in projects:
             return f"Error fetching projects: {projects['error']}"
         
         def today_filter(task: Dict[str, Any]) -> bool:
             return _is_task_due_in_days(task, 1)
         
-        return _get_project_tasks_by_filter(projects, today_filter, "due today")
+        return await _get_project_tasks_by_filter(projects, today_filter, "due today")
         
     except Exception as e:
         logger.error(f"Error in get_tasks_due_today: {e}")
@@ -667,7 +681,7 @@ async def get_tasks_due_in_days(days: int) -> str:
         return "Days must be a non-negative integer."
     
     try:
-        projects = ticktick.get_projects()
+        projects = await mirror.get_projects()
         if 'error' in projects:
             return f"Error fetching projects: {projects['error']}"
         
@@ -675,7 +689,7 @@ async def get_tasks_due_in_days(days: int) -> str:
             return _is_task_due_in_days(task, days)
         
         day_description = "today" if days == 0 else f"in {days} day{'s' if days != 1 else ''}"
-        return _get_project_tasks_by_filter(projects, days_filter, f"due {day_description}")
+        return await _get_project_tasks_by_filter(projects, days_filter, f"due {day_description}")
         
     except Exception as e:
         logger.error(f"Error in get_tasks_due_in_days: {e}")
@@ -689,7 +703,7 @@ async def get_tasks_due_this_week() -> str:
             return "Failed to initialize TickTick client. Please check your API credentials."
     
     try:
-        projects = ticktick.get_projects()
+        projects = await mirror.get_projects()
         if 'error' in projects:
             return f"Error fetching projects: {projects['error']}"
         
@@ -706,7 +720,7 @@ async def get_tasks_due_this_week() -> str:
             except (ValueError, TypeError):
                 return False
         
-        return _get_project_tasks_by_filter(projects, week_filter, "due this week")
+        return await _get_project_tasks_by_filter(projects, week_filter, "due this week")
         
     except Exception as e:
         logger.error(f"Error in get_tasks_due_this_week: {e}")
@@ -728,14 +742,14 @@ async def search_tasks(search_term: str) -> str:
         return "Search term cannot be empty."
     
     try:
-        projects = ticktick.get_projects()
+        projects = await mirror.get_projects()
         if 'error' in projects:
             return f"Error fetching projects: {projects['error']}"
         
         def search_filter(task: Dict[str, Any]) -> bool:
             return _task_matches_search(task, search_term)
         
-        return _get_project_tasks_by_filter(projects, search_filter, f"matching '{search_term}'")
+        return await _get_project_tasks_by_filter(projects, search_filter, f"matching '{search_term}'")
         
     except Exception as e:
         logger.error(f"Error in search_tasks: {e}")
@@ -801,7 +815,7 @@ async def batch_create_tasks(tasks: List[Dict[str, Any]]) -> str:
                 priority = task_data.get('priority', 0)
                 
                 # Create the task
-                result = ticktick.create_task(
+                result = await mirror.create_task(
                     title=title,
                     project_id=project_id,
                     content=content,
@@ -853,7 +867,7 @@ async def get_engaged_tasks() -> str:
             return "Failed to initialize TickTick client. Please check your API credentials."
     
     try:
-        projects = ticktick.get_projects()
+        projects = await mirror.get_projects()
         if 'error' in projects:
             return f"Error fetching projects: {projects['error']}"
         
@@ -863,7 +877,7 @@ async def get_engaged_tasks() -> str:
             is_today = _is_task_due_today(task)
             return is_high_priority or is_overdue or is_today
         
-        return _get_project_tasks_by_filter(projects, engaged_filter, "engaged")
+        return await _get_project_tasks_by_filter(projects, engaged_filter, "engaged")
         
     except Exception as e:
         logger.error(f"Error in get_engaged_tasks: {e}")
@@ -880,7 +894,7 @@ async def get_next_tasks() -> str:
             return "Failed to initialize TickTick client. Please check your API credentials."
     
     try:
-        projects = ticktick.get_projects()
+        projects = await mirror.get_projects()
         if 'error' in projects:
             return f"Error fetching projects: {projects['error']}"
         
@@ -889,7 +903,7 @@ async def get_next_tasks() -> str:
             is_due_tomorrow = _is_task_due_in_days(task, 1)
             return is_medium_priority or is_due_tomorrow
         
-        return _get_project_tasks_by_filter(projects, next_filter, "next")
+        return await _get_project_tasks_by_filter(projects, next_filter, "next")
         
     except Exception as e:
         logger.error(f"Error in get_next_tasks: {e}")
@@ -922,7 +936,7 @@ async def create_subtask(
         return "Invalid priority. Must be 0 (None), 1 (Low), 3 (Medium), or 5 (High)."
     
     try:
-        subtask = ticktick.create_subtask(
+        subtask = await mirror.create_subtask(
             subtask_title=subtask_title,
             parent_task_id=parent_task_id,
             project_id=project_id,
@@ -941,7 +955,7 @@ async def create_subtask(
 def main():
     """Main entry point for the MCP server."""
     # Initialize the TickTick client
-    if not initialize_client():
+    if not check_connection() or not initialize_client():
         logger.error("Failed to initialize TickTick client. Please check your API credentials.")
         return
     
@@ -0,0 +1,211 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Jak dlouho (sekundy) věřit lokální kopii projektů a úkolů, než se znovu stáhne z API
+TICKTICK_CACHE_TTL = float(os.getenv("TICKTICK_CACHE_TTL", "60"))
+# Kolik projektů stahovat souběžně u nástrojů napříč projekty (get_all_tasks, search_tasks, ...)
+PROJECT_FETCH_CONCURRENCY = int(os.getenv("TICKTICK_FETCH_CONCURRENCY", "8"))
+
+PROJECTS_KEY = "projects"
+
+
+class TaskMirror:
+    """
+    Lokální kopie projektů a úkolů z TickTick API.
+    Naplní se při prvním čtení, po TTL se stáhne znovu. Změny provedené přes mirror
+    (create_task, complete_task, ...) zapíše rovnou do lokální kopie, takže několik
+    nástrojů volaných v jednom tahu agenta odpovídá z paměti.
+    """
+
+    def __init__(self, client, ttl: float = TICKTICK_CACHE_TTL, concurrency: int = PROJECT_FETCH_CONCURRENCY):
+        """
+        Args:
+            client: AsyncTickTickClient
+            ttl: Platnost lokální kopie v sekundách (0 = vždy stahovat)
+            concurrency: Kolik projektů stahovat z API souběžně
+        """
+        self.client = client
+        self.ttl = ttl
+        self._semaphore = asyncio.Semaphore(concurrency)
+        # klíč (PROJECTS_KEY nebo ID projektu) -> (čas stažení, data)
+        self._entries: Dict[str, tuple] = {}
+        # Verze klíče se zvýší při zneplatnění - stahování, které začalo před změnou, výsledek neuloží
+        self._versions: Dict[str, int] = {}
+        # Probíhající stahování - souběžné nástroje se připojí ke stejnému požadavku
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    def _cached(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry[0] >= self.ttl:
+            return None
+        return entry[1]
+
+    async def _get(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """Vrátí data z lokální kopie, nebo je stáhne (nejvýše jedno stahování na klíč současně)"""
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(key, fetch))
+            self._inflight[key] = task
+
+            def forget(done: asyncio.Task):
+                if self._inflight.get(key) is done:
+                    del self._inflight[key]
+            task.add_done_callback(forget)
+        # Zrušení jednoho nástroje nesmí zrušit stahování, na které čekají i ostatní
+        return await asyncio.shield(task)
+
+    async def _load(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        version = self._versions.get(key, 0)
+        started = time.monotonic()
+        data = await fetch()
+        # Chybové odpovědi ({"error": ...}) se neukládají, další čtení to zkusí znovu
+        if not self._failed(data) and self._versions.get(key, 0) == version:
+            self._entries[key] = (started, data)
+        logger.debug(f"TickTick mirror: '{key}' staženo za {time.monotonic() - started:.2f}s")
+        return data
+
+    def invalidate(self, key: str):
+        """Zahodí lokální kopii projektu (nebo seznamu projektů pro PROJECTS_KEY)"""
+        self._entries.pop(key, None)
+        self._inflight.pop(key, None)
+        self._versions[key] = self._versions.get(key, 0) + 1
+
+    def invalidate_all(self):
+        for key in list(self._entries) + list(self._inflight):
+            self.invalidate(key)
+
+    # Čtení
+
+    async def get_projects(self) -> List[Dict]:
+        """Seznam projektů (při chybě API slovník s klíčem 'error')"""
+        return await self._get(PROJECTS_KEY, self.client.get_projects)
+
+    async def get_project_data(self, project_id: str) -> Dict:
+        """Projekt s úkoly a sloupci (při chybě API slovník s klíčem 'error')"""
+        async def fetch():
+            async with self._semaphore:
+                return await self.client.get_project_with_data(project_id)
+        return await self._get(project_id, fetch)
+
+    async def get_projects_data(self, project_ids: List[str]) -> List[Dict]:
+        """
+        Data více projektů - chybějící se stáhnou souběžně (nejvýše `concurrency` požadavků naráz).
+        Výsledky jsou ve stejném pořadí jako project_ids.
+        """
+        return await asyncio.gather(*(self.get_project_data(project_id) for project_id in project_ids))
+
+    async def get_task(self, project_id: str, task_id: str) -> Dict:
+        """Úkol z lokální kopie projektu; dokončené úkoly (v kopii nejsou) se načtou z API"""
+        project_data = self._cached(project_id)
+        if project_data is not None:
+            for task in project_data.get('tasks', []):
+                if task.get('id') == task_id:
+                    return task
+        return await self.client.get_task(project_id, task_id)
+
+    # Změny - výsledek úspěšné změny se rovnou zapíše do lokální kopie (write-through),
+    # takže typické "vytvoř a vypiš" nepotřebuje nové stahování
+
+    def _apply(self, key: str, update: Callable[[Any], Any]):
+        """
+        Upraví lokální kopii klíče funkcí update (nová kopie, čtenáři rozpracovaných výsledků ji nevidí).
+        Stahování, které běželo během změny, výsledek neuloží - nemusí změnu obsahovat.
+        """
+        self._inflight.pop(key, None)
+        self._versions[key] = self._versions.get(key, 0) + 1
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries[key] = (entry[0], update(entry[1]))
+
+    def _apply_task(self, project_id: str, task: Dict):
+        """Vloží nebo nahradí úkol v lokální kopii projektu"""
+        def update(project_data: Dict) -> Dict:
+            tasks = list(project_data.get('tasks', []))
+            for i, existing in enumerate(tasks):
+                if existing.get('id') == task['id']:
+                    tasks[i] = task
+                    break
+            else:
+                tasks.append(task)
+            return {**project_data, 'tasks': tasks}
+        self._apply(project_id, update)
+
+    def _remove_task(self, project_id: str, task_id: str):
+        def update(project_data: Dict) -> Dict:
+            return {**project_data, 'tasks': [t for t in project_data.get('tasks', []) if t.get('id') != task_id]}
+        self._apply(project_id, update)
+
+    def _store_task(self, project_id: str, task: Dict):
+        if not isinstance(task, dict) or not task.get('id'):
+            # Odpověď bez úkolu - projekt se při dalším čtení stáhne znovu
+            self.invalidate(project_id)
+            return
+        task_project_id = task.get('projectId') or project_id
+        if task_project_id != project_id:
+            # Úkol se přesunul do jiného projektu
+            self._remove_task(project_id, task['id'])
+        self._apply_task(task_project_id, task)
+
+    @staticmethod
+    def _failed(result: Any) -> bool:
+        return isinstance(result, dict) and 'error' in result
+
+    async def create_task(self, project_id: str, **kwargs) -> Dict:
+        task = await self.client.create_task(project_id=project_id, **kwargs)
+        if not self._failed(task):
+            self._store_task(project_id, task)
+        return task
+
+    async def create_subtask(self, project_id: str, **kwargs) -> Dict:
+        subtask = await self.client.create_subtask(project_id=project_id, **kwargs)
+        if not self._failed(subtask):
+            self._store_task(project_id, subtask)
+        return subtask
+
+    async def update_task(self, task_id: str, project_id: str, **kwargs) -> Dict:
+        task = await self.client.update_task(task_id=task_id, project_id=project_id, **kwargs)
+        if not self._failed(task):
+            self._store_task(project_id, task)
+        return task
+
+    async def complete_task(self, project_id: str, task_id: str) -> Dict:
+        result = await self.client.complete_task(project_id, task_id)
+        if not self._failed(result):
+            # Data projektu obsahují jen nedokončené úkoly
+            self._remove_task(project_id, task_id)
+        return result
+
+    async def delete_task(self, project_id: str, task_id: str) -> Dict:
+        result = await self.client.delete_task(project_id, task_id)
+        if not self._failed(result):
+            self._remove_task(project_id, task_id)
+        return result
+
+    async def create_project(self, **kwargs) -> Dict:
+        project = await self.client.create_project(**kwargs)
+        if self._failed(project):
+            return project
+        if not isinstance(project, dict) or not project.get('id'):
+            self.invalidate(PROJECTS_KEY)
+            return project
+        self._apply(PROJECTS_KEY, lambda projects: [p for p in projects if p.get('id') != project['id']] + [project])
+        # Nový projekt je prázdný - není potřeba ho stahovat
+        self.invalidate(project['id'])
+        self._entries[project['id']] = (time.monotonic(), {'project': project, 'tasks': [], 'columns': []})
+        return project
+
+    async def delete_project(self, project_id: str) -> Dict:
+        result = await self.client.delete_project(project_id)
+        if not self._failed(result):
+            self._apply(PROJECTS_KEY, lambda projects: [p for p in projects if p.get('id') != project_id])
+            self.invalidate(project_id)
+        return result
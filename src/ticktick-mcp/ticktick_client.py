@@ -1,17 +1,54 @@
+import abc
+import asyncio
 import json
 import base64
+import os
+import random
+import re
+import sys
+import threading
+import time
+import httpx
 import requests
 import logging
+from email.utils import parsedate_to_datetime
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
+
+from requests.adapters import HTTPAdapter
+
+# Zápis tokenů a zámek obnovy sdílí s API (token_refresher) - MCP server běží jako samostatný proces
+sys.path.insert(0, str(Path(__file__).parent.parent / "lib"))
+from token_store import async_refresh_lock, refresh_lock, write_tokens
 
 logger = logging.getLogger(__name__)
 
 TOKEN_PATH = Path(__file__).parent.parent / "lib" / "tokens" / "ticktick_tokens.json"
 
-class TickTickClient:
+# Timeouty požadavků na TickTick API (sekundy) a počet opakování při 429/5xx
+TICKTICK_CONNECT_TIMEOUT = float(os.getenv("TICKTICK_CONNECT_TIMEOUT", "5"))
+TICKTICK_READ_TIMEOUT = float(os.getenv("TICKTICK_READ_TIMEOUT", "30"))
+TICKTICK_MAX_RETRIES = int(os.getenv("TICKTICK_MAX_RETRIES", "3"))
+# Nejdelší čekání před opakováním (i když Retry-After žádá víc)
+RETRY_MAX_WAIT = 30.0
+RETRY_BACKOFF_INITIAL = 0.5
+# 5xx se opakuje jen u idempotentních požadavků - POST (vytvoření úkolu) mohl na serveru proběhnout
+RETRY_STATUSES = {500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "DELETE"}
+# Velikost poolu spojení - stačí na souběžné stahování projektů
+POOL_SIZE = 16
+# ID v cestě endpointu - statistiky se sčítají za endpoint, ne za jednotlivé projekty
+ID_SEGMENT = re.compile(r"/(project|task)/[^/]+")
+
+AUTH_FAILED_ERROR = {"error": "Authentication failed. Access token expired and refresh failed. Please re-authenticate via /api/ticktick/auth"}
+
+class TickTickClientBase(abc.ABC):
     """
-    Client for the TickTick API using OAuth2 authentication.
+    Shared base of the sync and async TickTick clients: tokens, retry policy,
+    request statistics and the API method surface.
+    Subclasses implement the transport (_make_request, _refresh_access_token).
+    Refresh token se při obnově mění - obnovu smí naráz provádět jen jeden proces
+    (zámek token_store.refresh_lock sdílený s refresherem v API).
     """
     def __init__(self):
         self._load_tokens()
@@ -22,6 +59,9 @@ class TickTickClient:
             "Content-Type": "application/json",
             "User-Agent": 'ticktick-mcp-client'
         }
+        # "GET /project/{id}/data" -> počty a latence požadavků
+        self._endpoint_stats: Dict[str, Dict[str, Any]] = {}
+        self._stats_lock = threading.Lock()
 
     def _load_tokens(self):
         if not TOKEN_PATH.exists():
@@ -32,6 +72,7 @@ class TickTickClient:
             raise RuntimeError(f"Soubor s tokenem neexistoval, vytvořen prázdný: {TOKEN_PATH}")
         
         try:
+            self._tokens_mtime = TOKEN_PATH.stat().st_mtime
             with open(TOKEN_PATH, "r", encoding="utf-8") as f:
                 content = f.read().strip()
                 if not content:
@@ -46,14 +87,20 @@ class TickTickClient:
         self.refresh_token = data.get("refresh_token")
         self.client_id = data.get("client_id")
         self.client_secret = data.get("client_secret")
+        self.token_data = data
+        # Expirace tokenu (callback i refresh ukládají obtained_at a expires_in)
+        obtained_at = data.get("obtained_at")
+        expires_in = data.get("expires_in")
+        self.expires_at = obtained_at + expires_in if obtained_at and expires_in else None
         
         if not self.access_token:
             raise RuntimeError("Chybí access_token v ticktick_tokens.json. Přihlas se přes UI.")
 
-    def _refresh_access_token(self) -> bool:
+    def _refresh_request(self) -> Optional[Tuple[Dict[str, str], Dict[str, str]]]:
+        """Data a hlavičky požadavku na obnovu tokenu (None bez refresh tokenu nebo client credentials)"""
         if not self.refresh_token or not self.client_id or not self.client_secret:
             logger.warning("Chybí refresh token nebo client credentials.")
-            return False
+            return None
         
         logger.info("🔄 Attempting to refresh access token...")
         
@@ -67,81 +114,155 @@ class TickTickClient:
             "Authorization": f"Basic {auth_b64}",
             "Content-Type": "application/x-www-form-urlencoded"
         }
+        return token_data, headers
+
+    def _store_refreshed_tokens(self, tokens: Dict[str, Any]):
+        """Převezme nové tokeny z odpovědi na obnovu a uloží je do souboru (blokující - zápis s fsync)"""
+        self._write_tokens(self._apply_refreshed_tokens(tokens))
+
+    def _apply_refreshed_tokens(self, tokens: Dict[str, Any]) -> Dict[str, Any]:
+        """Převezme nové tokeny z odpovědi na obnovu - vrátí obsah souboru s tokeny k uložení"""
+        self.access_token = tokens.get('access_token')
+        if 'refresh_token' in tokens:
+            self.refresh_token = tokens.get('refresh_token')
+        self.headers["Authorization"] = f"Bearer {self.access_token}"
+        obtained_at = int(time.time())
+        expires_in = tokens.get("expires_in")
+        self.expires_at = obtained_at + expires_in if expires_in else None
+        return {
+            "access_token": self.access_token,
+            "refresh_token": self.refresh_token,
+            "token_type": tokens.get("token_type", self.token_data.get("token_type", "bearer")),
+            "expires_in": expires_in,
+            "obtained_at": obtained_at,
+            "scope": tokens.get("scope", self.token_data.get("scope", "")),
+            "client_id": self.client_id,
+            "client_secret": self.client_secret
+        }
+
+    def _write_tokens(self, saved: Dict[str, Any]):
+        """Zapíše tokeny zpět do JSON souboru (blokující)"""
+        write_tokens(TOKEN_PATH, saved)
+        self.token_data = saved
+        self._tokens_mtime = TOKEN_PATH.stat().st_mtime
+        logger.info("✓ Access token refreshed successfully.")
+
+    def _refreshed_elsewhere(self, rejected_token: Optional[str]) -> bool:
+        """
+        Volat pod zámkem obnovy: načte soubor znovu a vrátí True, pokud už token obnovil
+        někdo jiný (refresher v API, jiný požadavek) - jeho refresh token je pak neplatný
+        """
+        self.reload_if_changed()
+        return rejected_token is not None and self.access_token != rejected_token
+
+    def _expires_within(self, margin_seconds: float) -> bool:
+        return bool(self.expires_at) and self.expires_at - time.time() < margin_seconds
+
+    def reload_if_changed(self) -> bool:
+        """
+        Znovu načte tokeny, pokud soubor mezitím přepsal někdo jiný (obnova tokenu na pozadí v API,
+        nové přihlášení) - vrátí True při změně
+        """
         try:
-            response = requests.post(self.token_url, data=token_data, headers=headers)
-            
-            # Log the response for debugging
-            logger.info(f"Refresh token response status: {response.status_code}")
-            if response.status_code != 200:
-                logger.error(f"Refresh token failed with status {response.status_code}")
-                logger.error(f"Response: {response.text[:500]}")
-                return False
-            
-            response.raise_for_status()
-            tokens = response.json()
-            self.access_token = tokens.get('access_token')
-            if 'refresh_token' in tokens:
-                self.refresh_token = tokens.get('refresh_token')
-            self.headers["Authorization"] = f"Bearer {self.access_token}"
-            # Ulož nové tokeny zpět do JSON souboru
-            with open(TOKEN_PATH, "w", encoding="utf-8") as f:
-                json.dump({
-                    "access_token": self.access_token,
-                    "refresh_token": self.refresh_token,
-                    "client_id": self.client_id,
-                    "client_secret": self.client_secret
-                }, f, ensure_ascii=False, indent=2)
-            logger.info("✓ Access token refreshed successfully.")
-            return True
-        except requests.exceptions.RequestException as e:
-            logger.error(f"❌ Error refreshing access token: {e}")
-            if hasattr(e, 'response') and e.response is not None:
-                logger.error(f"Response text: {e.response.text[:500]}")
+            mtime = TOKEN_PATH.stat().st_mtime
+        except OSError:
+            return False
+        if mtime == self._tokens_mtime:
             return False
-
-    def _make_request(self, method: str, endpoint: str, data=None) -> Dict:
-        url = f"{self.base_url}{endpoint}"
         try:
-            if method == "GET":
-                response = requests.get(url, headers=self.headers)
-            elif method == "POST":
-                response = requests.post(url, headers=self.headers, json=data)
-            elif method == "DELETE":
-                response = requests.delete(url, headers=self.headers)
-            else:
-                raise ValueError(f"Unsupported HTTP method: {method}")
-            if response.status_code == 401:
-                logger.info("Access token expired. Attempting to refresh...")
-                if self._refresh_access_token():
-                    # Retry the request with the new token
-                    if method == "GET":
-                        response = requests.get(url, headers=self.headers)
-                    elif method == "POST":
-                        response = requests.post(url, headers=self.headers, json=data)
-                    elif method == "DELETE":
-                        response = requests.delete(url, headers=self.headers)
-                else:
-                    logger.error("Failed to refresh access token. Re-authentication required.")
-                    return {"error": "Authentication failed. Access token expired and refresh failed. Please re-authenticate via /api/ticktick/auth"}
-            
-            # Check for non-JSON error responses (HTML error pages)
-            if response.status_code >= 400:
-                logger.error(f"API error {response.status_code}: {response.text[:500]}")
-                return {"error": f"TickTick API error {response.status_code}: {response.text[:200]}"}
-            
-            response.raise_for_status()
-            if response.status_code == 204 or response.text == "":
-                return {}
-            
-            # Try to parse JSON, handle HTML responses
+            self._load_tokens()
+        except RuntimeError as e:
+            logger.warning(f"Nepodařilo se znovu načíst tokeny: {e}")
+            return False
+        self.headers["Authorization"] = f"Bearer {self.access_token}"
+        logger.info("🔑 Načten nový TickTick access token ze souboru")
+        return True
+
+    @staticmethod
+    def _endpoint_key(method: str, endpoint: str) -> str:
+        """Klíč statistik bez ID - "GET /project/{id}/task/{id}" """
+        return method + " " + ID_SEGMENT.sub(r"/\1/{id}", endpoint)
+
+    def _record(self, key: str, started: float, error: bool = False, retry: bool = False):
+        elapsed_ms = (time.monotonic() - started) * 1000
+        with self._stats_lock:
+            stats = self._endpoint_stats.setdefault(key, {"count": 0, "errors": 0, "retries": 0, "total_ms": 0.0, "max_ms": 0.0})
+            stats["count"] += 1
+            stats["errors"] += int(error)
+            stats["retries"] += int(retry)
+            stats["total_ms"] += elapsed_ms
+            stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Počty, chyby, opakování a latence požadavků podle endpointu"""
+        with self._stats_lock:
+            return {
+                key: {
+                    "count": stats["count"],
+                    "errors": stats["errors"],
+                    "retries": stats["retries"],
+                    "avg_ms": round(stats["total_ms"] / stats["count"], 1),
+                    "max_ms": round(stats["max_ms"], 1)
+                }
+                for key, stats in self._endpoint_stats.items()
+            }
+
+    @staticmethod
+    def _check_method(method: str):
+        if method not in ("GET", "POST", "DELETE"):
+            raise ValueError(f"Unsupported HTTP method: {method}")
+
+    @staticmethod
+    def _should_retry(method: str, status_code: int) -> bool:
+        return status_code == 429 or (status_code in RETRY_STATUSES and method in IDEMPOTENT_METHODS)
+
+    @staticmethod
+    def _retry_delay(retry_after: Optional[str], attempt: int) -> float:
+        """Prodleva před opakováním - podle Retry-After, jinak exponenciální backoff s jitterem"""
+        if retry_after:
             try:
-                return response.json()
-            except json.JSONDecodeError:
-                logger.error(f"Invalid JSON response: {response.text[:500]}")
-                return {"error": f"Invalid API response (not JSON): {response.text[:200]}"}
-        except requests.exceptions.RequestException as e:
-            logger.error(f"API request failed: {e}")
-            return {"error": str(e)}
+                delay = float(retry_after)
+            except ValueError:
+                try:
+                    delay = parsedate_to_datetime(retry_after).timestamp() - time.time()
+                except (TypeError, ValueError):
+                    delay = None
+            if delay is not None:
+                return min(max(delay, 0.0), RETRY_MAX_WAIT)
+        delay = RETRY_BACKOFF_INITIAL * (2 ** attempt)
+        return min(delay + random.uniform(0, delay / 2), RETRY_MAX_WAIT)
+
+    @staticmethod
+    def _log_retry(key: str, reason: str, delay: float, attempt: int):
+        logger.warning(f"TickTick {key}: {reason}, opakuji za {delay:.1f}s ({attempt}/{TICKTICK_MAX_RETRIES})")
+
+    @staticmethod
+    def _parse_response(status_code: int, text: str, parse_json) -> Dict:
+        """Převede odpověď API na slovník (při chybě {"error": ...})"""
+        # Check for non-JSON error responses (HTML error pages)
+        if status_code >= 400:
+            logger.error(f"API error {status_code}: {text[:500]}")
+            return {"error": f"TickTick API error {status_code}: {text[:200]}"}
+        
+        if status_code == 204 or text == "":
+            return {}
+        
+        # Try to parse JSON, handle HTML responses
+        try:
+            return parse_json()
+        except json.JSONDecodeError:
+            logger.error(f"Invalid JSON response: {text[:500]}")
+            return {"error": f"Invalid API response (not JSON): {text[:200]}"}
+
+    @abc.abstractmethod
+    def _make_request(self, method: str, endpoint: str, data=None) -> Dict:
+        """Odešle požadavek na API (s obnovou tokenu při 401) a vrátí zpracovanou odpověď"""
+
+    @abc.abstractmethod
+    def _refresh_access_token(self, rejected_token: Optional[str] = None) -> bool:
+        """Obnoví access token pod zámkem sdíleným s ostatními procesy"""
+
+    # API metody vrací výsledek _make_request - u AsyncTickTickClient je to coroutine (await)
 
     # Project methods
     def get_projects(self) -> List[Dict]:
@@ -268,4 +389,239 @@ class TickTickClient:
         if priority is not None:
             data["priority"] = priority
             
-        return self._make_request("POST", "/task", data)
\ No newline at end of file
+        return self._make_request("POST", "/task", data)
+
+
+class TickTickClient(TickTickClientBase):
+    """
+    Client for the TickTick API using OAuth2 authentication.
+    Blokující (requests) - používá ho refresher tokenů v API; MCP server používá AsyncTickTickClient.
+    """
+    def __init__(self):
+        super().__init__()
+        self.timeout = (TICKTICK_CONNECT_TIMEOUT, TICKTICK_READ_TIMEOUT)
+        # Sdílená session drží spojení otevřená (keep-alive) - další požadavek neplatí TCP + TLS handshake
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=POOL_SIZE)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _refresh_access_token(self, rejected_token: Optional[str] = None) -> bool:
+        """
+        Obnoví access token (pod zámkem sdíleným s ostatními procesy)
+
+        Args:
+            rejected_token: Token, který server odmítl - pokud už v souboru je jiný, obnova se přeskočí
+        """
+        with refresh_lock(TOKEN_PATH):
+            if self._refreshed_elsewhere(rejected_token):
+                logger.info("🔑 TickTick token už obnovil jiný proces")
+                return True
+            return self._request_new_token()
+
+    def _request_new_token(self) -> bool:
+        refresh_request = self._refresh_request()
+        if refresh_request is None:
+            return False
+        token_data, headers = refresh_request
+        try:
+            response = self.session.post(self.token_url, data=token_data, headers=headers, timeout=self.timeout)
+            
+            # Log the response for debugging
+            logger.info(f"Refresh token response status: {response.status_code}")
+            if response.status_code != 200:
+                logger.error(f"Refresh token failed with status {response.status_code}")
+                logger.error(f"Response: {response.text[:500]}")
+                return False
+            
+            self._store_refreshed_tokens(response.json())
+            return True
+        except requests.exceptions.RequestException as e:
+            logger.error(f"❌ Error refreshing access token: {e}")
+            if hasattr(e, 'response') and e.response is not None:
+                logger.error(f"Response text: {e.response.text[:500]}")
+            return False
+
+    def refresh_if_expiring(self, margin_seconds: float) -> bool:
+        """
+        Obnoví token, pokud vyprší dřív než za margin_seconds
+        Obnovu provede jen jeden proces, ostatní si nový token načtou ze souboru
+
+        Returns:
+            True pokud se token obnovil
+        """
+        self.reload_if_changed()
+        if not self._expires_within(margin_seconds):
+            return False
+        with refresh_lock(TOKEN_PATH):
+            # Mezitím mohl token obnovit jiný proces
+            self.reload_if_changed()
+            if not self._expires_within(margin_seconds):
+                return False
+            logger.info(f"TickTick token vyprší za {int(self.expires_at - time.time())}s, obnovuji...")
+            return self._request_new_token()
+
+    def _send(self, method: str, endpoint: str, data=None) -> requests.Response:
+        """
+        Odešle požadavek přes sdílenou session s timeouty.
+        Při 429 (a u GET/DELETE i při 5xx nebo výpadku spojení) ho zopakuje s backoffem.
+        """
+        self._check_method(method)
+        url = f"{self.base_url}{endpoint}"
+        key = self._endpoint_key(method, endpoint)
+        attempt = 0
+        while True:
+            started = time.monotonic()
+            try:
+                response = self.session.request(method, url, headers=self.headers, json=data, timeout=self.timeout)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                # Nenavázané spojení lze zopakovat vždy, ostatní chyby jen u idempotentních požadavků
+                retryable = method in IDEMPOTENT_METHODS or isinstance(e, requests.exceptions.ConnectTimeout)
+                if not retryable or attempt >= TICKTICK_MAX_RETRIES:
+                    self._record(key, started, error=True)
+                    raise
+                self._record(key, started, error=True, retry=True)
+                delay = self._retry_delay(None, attempt)
+                reason = type(e).__name__
+            else:
+                if not self._should_retry(method, response.status_code) or attempt >= TICKTICK_MAX_RETRIES:
+                    self._record(key, started, error=response.status_code >= 400)
+                    return response
+                self._record(key, started, error=True, retry=True)
+                delay = self._retry_delay(response.headers.get("Retry-After"), attempt)
+                reason = f"HTTP {response.status_code}"
+
+            attempt += 1
+            self._log_retry(key, reason, delay, attempt)
+            time.sleep(delay)
+
+    def _make_request(self, method: str, endpoint: str, data=None) -> Dict:
+        # Token mohla mezitím obnovit API (refresher na pozadí)
+        self.reload_if_changed()
+        try:
+            # Token, se kterým požadavek odešel - během čekání na odpověď ho mohl obnovit někdo jiný
+            sent_token = self.access_token
+            response = self._send(method, endpoint, data)
+            if response.status_code == 401:
+                logger.info("Access token expired. Attempting to refresh...")
+                if self._refresh_access_token(rejected_token=sent_token):
+                    # Retry the request with the new token
+                    response = self._send(method, endpoint, data)
+                else:
+                    logger.error("Failed to refresh access token. Re-authentication required.")
+                    return dict(AUTH_FAILED_ERROR)
+            
+            return self._parse_response(response.status_code, response.text, response.json)
+        except requests.exceptions.RequestException as e:
+            logger.error(f"API request failed: {e}")
+            return {"error": str(e)}
+
+
+class AsyncTickTickClient(TickTickClientBase):
+    """
+    Asynchronní klient TickTick API (httpx) se stejnými metodami jako TickTickClient - na metody se čeká (await).
+    Souběžná volání nástrojů MCP serveru tak neblokují event loop a běží skutečně paralelně.
+    """
+    def __init__(self):
+        super().__init__()
+        # Sdílený klient drží spojení otevřená (keep-alive) a omezuje jejich počet
+        self.http = httpx.AsyncClient(
+            timeout=httpx.Timeout(TICKTICK_READ_TIMEOUT, connect=TICKTICK_CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=POOL_SIZE, max_keepalive_connections=POOL_SIZE)
+        )
+        # Při souběžných 401 obnoví token jen první požadavek, ostatní použijí nový
+        self._refresh_lock = asyncio.Lock()
+
+    async def aclose(self):
+        await self.http.aclose()
+
+    async def _refresh_access_token(self, rejected_token: Optional[str] = None) -> bool:
+        """
+        Obnoví access token (pod zámkem sdíleným s ostatními procesy)
+
+        Args:
+            rejected_token: Token, který server odmítl - pokud už je k dispozici jiný, obnova se přeskočí
+        """
+        async with async_refresh_lock(TOKEN_PATH):
+            if self._refreshed_elsewhere(rejected_token):
+                logger.info("🔑 TickTick token už obnovil jiný požadavek nebo proces")
+                return True
+            return await self._request_new_token()
+
+    async def _request_new_token(self) -> bool:
+        refresh_request = self._refresh_request()
+        if refresh_request is None:
+            return False
+        token_data, headers = refresh_request
+        try:
+            response = await self.http.post(self.token_url, data=token_data, headers=headers)
+            
+            logger.info(f"Refresh token response status: {response.status_code}")
+            if response.status_code != 200:
+                logger.error(f"Refresh token failed with status {response.status_code}")
+                logger.error(f"Response: {response.text[:500]}")
+                return False
+            
+            # Zápis souboru (fsync) neblokuje event loop
+            await asyncio.to_thread(self._write_tokens, self._apply_refreshed_tokens(response.json()))
+            return True
+        except httpx.HTTPError as e:
+            logger.error(f"❌ Error refreshing access token: {e}")
+            return False
+
+    async def _send(self, method: str, endpoint: str, data=None) -> httpx.Response:
+        """
+        Odešle požadavek přes sdíleného httpx klienta.
+        Při 429 (a u GET/DELETE i při 5xx nebo výpadku spojení) ho zopakuje s backoffem.
+        """
+        self._check_method(method)
+        url = f"{self.base_url}{endpoint}"
+        key = self._endpoint_key(method, endpoint)
+        attempt = 0
+        while True:
+            started = time.monotonic()
+            try:
+                response = await self.http.request(method, url, headers=self.headers, json=data)
+            except httpx.TransportError as e:
+                # Nenavázané spojení lze zopakovat vždy, ostatní chyby jen u idempotentních požadavků
+                retryable = method in IDEMPOTENT_METHODS or isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout))
+                if not retryable or attempt >= TICKTICK_MAX_RETRIES:
+                    self._record(key, started, error=True)
+                    raise
+                self._record(key, started, error=True, retry=True)
+                delay = self._retry_delay(None, attempt)
+                reason = type(e).__name__
+            else:
+                if not self._should_retry(method, response.status_code) or attempt >= TICKTICK_MAX_RETRIES:
+                    self._record(key, started, error=response.status_code >= 400)
+                    return response
+                self._record(key, started, error=True, retry=True)
+                delay = self._retry_delay(response.headers.get("Retry-After"), attempt)
+                reason = f"HTTP {response.status_code}"
+
+            attempt += 1
+            self._log_retry(key, reason, delay, attempt)
+            await asyncio.sleep(delay)
+
+    async def _make_request(self, method: str, endpoint: str, data=None) -> Dict:
+        # Token mohla mezitím obnovit API (refresher na pozadí)
+        self.reload_if_changed()
+        try:
+            # Token, se kterým požadavek odešel - souběžný požadavek ho mohl během čekání na odpověď obnovit
+            sent_token = self.access_token
+            response = await self._send(method, endpoint, data)
+            if response.status_code == 401:
+                logger.info("Access token expired. Attempting to refresh...")
+                async with self._refresh_lock:
+                    # Obnova se přeskočí, pokud už je k dispozici jiný token než ten odmítnutý
+                    refreshed = await self._refresh_access_token(sent_token)
+                if not refreshed:
+                    logger.error("Failed to refresh access token. Re-authentication required.")
+                    return dict(AUTH_FAILED_ERROR)
+                # Retry the request with the new token
+                response = await self._send(method, endpoint, data)
+            
+            return self._parse_response(response.status_code, response.text, response.json)
+        except httpx.HTTPError as e:
+            logger.error(f"API request failed: {e}")
+            return {"error": str(e) or type(e).__name__}
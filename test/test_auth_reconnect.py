@@ -0,0 +1,107 @@
+"""
+Test znovupřipojení HTTP MCP serveru po auth chybě
+Lokální streamable HTTP MCP server po "vypršení tokenu" odpovídá 401 - AgentService musí server znovu připojit
+"""
+
+import asyncio
+import os
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+
+import uvicorn
+from mcp.server.fastmcp import FastMCP
+from mcp_use import MCPClient
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "lib"))
+# LLM ani ostatní servery se v testu nevolají - klíče jsou potřeba jen pro import agent_core
+for name in ("OPENROUTER_API_KEY", "LINKUP_API_KEY", "N8N_API_URL", "N8N_API_KEY"):
+    os.environ.setdefault(name, "test")
+from agent_core import AgentService
+from mcp_config import NOTION_SERVER
+
+
+class ExpiringToken:
+    """ASGI middleware - po revoke() odpovídá na všechny požadavky 401 jako server s vypršelým tokenem"""
+
+    def __init__(self, app):
+        self.app = app
+        self.expired = False
+
+    def revoke(self):
+        self.expired = True
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and self.expired:
+            await send({"type": "http.response.start", "status": 401, "headers": [(b"content-type", b"text/plain")]})
+            await send({"type": "http.response.body", "body": b"invalid_token"})
+            return
+        await self.app(scope, receive, send)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_server():
+    mcp = FastMCP("notion-test")
+
+    @mcp.tool()
+    async def search(query: str) -> str:
+        """Vyhledá stránky"""
+        return f"výsledky pro {query}"
+
+    app = ExpiringToken(mcp.streamable_http_app())
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while not server.started:
+        assert time.monotonic() < deadline, "Testovací MCP server nenastartoval"
+        time.sleep(0.05)
+    return app, server, thread, f"http://127.0.0.1:{port}/mcp"
+
+
+def test_http_401_tool_result_reconnects_server():
+    """401 na volání nástroje (uprostřed session) naplánuje znovupřipojení serveru"""
+    print("🔑 Test: Reconnect po 401 z HTTP MCP serveru")
+    app, server, thread, url = _start_server()
+
+    async def run():
+        service = AgentService()
+        reconnected = []
+        service._schedule_reconnect = reconnected.append
+        service.client = MCPClient.from_dict({
+            "mcpServers": {NOTION_SERVER: service._watch_auth_errors(NOTION_SERVER, {"url": url})}
+        })
+        session = await service.client.create_session(NOTION_SERVER)
+        result = await session.connector.call_tool("search", {"query": "jarvis"})
+        assert result.content[0].text == "výsledky pro jarvis"
+        assert reconnected == [], "Úspěšné volání nesmí server znovu připojovat"
+
+        app.revoke()
+        try:
+            await asyncio.wait_for(session.connector.call_tool("search", {"query": "jarvis"}), timeout=10)
+        except Exception as e:
+            print(f"   Volání nástroje selhalo: {type(e).__name__}")
+        assert reconnected == [NOTION_SERVER], f"Server se po 401 nepřipojil znovu: {reconnected}"
+        try:
+            await service.client.close_all_sessions()
+        except BaseException:
+            pass
+
+    try:
+        asyncio.run(run())
+    finally:
+        server.should_exit = True
+        thread.join(10)
+    print("   ✅ PASS\n")
+
+
+if __name__ == "__main__":
+    test_http_401_tool_result_reconnects_server()
@@ -117,6 +117,32 @@ def test_list_sessions():
     print("   ✅ PASS\n")
     return data['sessions']
 
+def test_list_sessions_pagination():
+    """Test stránkování sessions přes cursor"""
+    print("📑 Test: List Sessions Pagination")
+    
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        resp = requests.get(
+            f"{API_BASE}/api/sessions",
+            headers=headers,
+            params=params
+        )
+        data = resp.json()
+        assert len(data['sessions']) <= 2, "Stránka je větší než limit!"
+        seen.extend(data['sessions'])
+        cursor = data.get('next_cursor')
+        if not cursor:
+            break
+    
+    print(f"   Načteno stránkováním: {len(seen)} / {data['total']}")
+    assert len(seen) == len(set(seen)), "Session se objevila na více stránkách!"
+    print("   ✅ PASS\n")
+
 def test_new_session_endpoint():
     """Test vytvoření nové session přes endpoint"""
     print("🎯 Test: New Session Endpoint")
@@ -177,6 +203,7 @@ def main():
         
         # 6. List sessions
         all_sessions = test_list_sessions()
+        test_list_sessions_pagination()
         
         # 7. New session endpoint
         session2 = test_new_session_endpoint()